@@ -0,0 +1,48 @@
+"""Add indexes for tenant and company scoped lookups
+
+Revision ID: 013_add_scoping_indexes
+Revises: 012_add_optional_items
+Create Date: 2025-08-20 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "013_add_scoping_indexes"
+down_revision = "012_add_optional_items"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index the foreign keys every scoped query filters on."""
+
+    # Quote lists filter on tenant_id and order by created_at desc
+    op.create_index(
+        "ix_quote_tenant_created",
+        "quote",
+        ["tenant_id", "created_at"]
+    )
+    op.create_index("ix_quote_company_id", "quote", ["company_id"])
+
+    # Items are always loaded per quote
+    op.create_index("ix_quote_item_quote_id", "quote_item", ["quote_id"])
+
+    op.create_index(
+        "ix_project_requirements_company_quote",
+        "project_requirements",
+        ["company_id", "quote_id"]
+    )
+
+    # generation_rule (company_id, key) is already covered by the unique
+    # ix_generation_rule_company_key from migration 009
+
+
+def downgrade() -> None:
+    """Drop the scoping indexes."""
+
+    op.drop_index("ix_project_requirements_company_quote", "project_requirements")
+    op.drop_index("ix_quote_item_quote_id", "quote_item")
+    op.drop_index("ix_quote_company_id", "quote")
+    op.drop_index("ix_quote_tenant_created", "quote")
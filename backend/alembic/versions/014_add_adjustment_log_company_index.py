@@ -0,0 +1,32 @@
+"""Add company index to quote_adjustment_log
+
+Revision ID: 014_add_adjustment_log_company_index
+Revises: 013_add_scoping_indexes
+Create Date: 2025-08-22 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "014_add_adjustment_log_company_index"
+down_revision = "013_add_scoping_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index adjustment logs for company-wide, newest-first reads."""
+
+    # Recent adjustments per company (tuning insights and the adjustment feed)
+    op.create_index(
+        "ix_quote_adjustment_log_company_created",
+        "quote_adjustment_log",
+        ["company_id", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    """Drop the company index."""
+
+    op.drop_index("ix_quote_adjustment_log_company_created", "quote_adjustment_log")
@@ -1,12 +1,18 @@
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from uuid import UUID
 
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
+from . import crud
 from .db import get_db
 from .models import User
 from .schemas import TokenData
@@ -17,6 +23,24 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15  # Shorter access token lifetime
 REFRESH_TOKEN_EXPIRE_DAYS = 7     # Longer refresh token lifetime
 
+# Validated tokens are cached briefly so repeated requests skip signature
+# verification and the user SELECT. Keys are token hashes, never raw tokens.
+# Entries are (user, company_id claim, token expiry).
+TOKEN_CACHE_TTL_SECONDS = 30
+_token_cache: "TTLCache[str, Tuple[User, Optional[UUID], float]]" = TTLCache(
+    maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS
+)
+_token_cache_lock = threading.Lock()
+
+# Access tokens with the default lifetime are reused for identical claims
+# within a signing window, so login bursts skip re-signing. The expiry is
+# taken from the window start, making tokens at most one window shorter.
+SIGNED_TOKEN_WINDOW_SECONDS = 30
+_signed_token_cache: "TTLCache[Tuple[Any, int], str]" = TTLCache(
+    maxsize=10000, ttl=SIGNED_TOKEN_WINDOW_SECONDS
+)
+_signed_token_cache_lock = threading.Lock()
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -35,17 +59,40 @@ def get_password_hash(password: str) -> str:
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create a JWT access token."""
+    """
+    Create a JWT access token.
+
+    Without expires_delta the token gets the default lifetime and is reused
+    for identical claims within the current signing window.
+    """
+    if expires_delta is None:
+        return _cached_access_token(data)
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": datetime.utcnow() + expires_delta})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def _cached_access_token(data: dict) -> str:
+    """Sign a default-lifetime access token, reusing one from the current window."""
+    window = int(time.time() // SIGNED_TOKEN_WINDOW_SECONDS)
+    key = (tuple(sorted(data.items())), window)
+    with _signed_token_cache_lock:
+        token = _signed_token_cache.get(key)
+    if token is not None:
+        return token
+
+    window_start = datetime.utcfromtimestamp(window * SIGNED_TOKEN_WINDOW_SECONDS)
+    to_encode = data.copy()
+    to_encode.update(
+        {"exp": window_start + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
+    )
+    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with _signed_token_cache_lock:
+        _signed_token_cache[key] = token
+    return token
+
+
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT refresh token."""
     to_encode = data.copy()
@@ -58,6 +105,22 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def access_token_claims(db: Session, user: User) -> Dict[str, Any]:
+    """
+    Build the access token claims for a user.
+
+    The user's company is resolved once here and embedded as company_id, so
+    authenticated requests can scope by company without querying for it.
+    """
+    company_id = (
+        crud.get_primary_company_id(db, user.tenant_id) if user.tenant_id else None
+    )
+    claims = {"sub": user.username, "tenant_id": str(user.tenant_id)}
+    if company_id is not None:
+        claims["company_id"] = str(company_id)
+    return claims
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """Authenticate a user with username and password."""
     user = db.query(User).filter(User.username == username).first()
@@ -68,16 +131,34 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from JWT token."""
+def _resolve_token(token: str, db: Session) -> Tuple[User, Optional[UUID]]:
+    """
+    Validate an access token and return its user and company_id claim.
+
+    Results are cached per token. Cached users are detached from any session
+    and must be treated as read-only. Entries never outlive the token's own
+    expiry.
+
+    Raises:
+        HTTPException: 401 if the token is invalid or the user does not exist
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    token_hash = hashlib.sha256(token.encode()).hexdigest()[:32]
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token_hash)
+    if cached is not None:
+        user, company_id, expires_at = cached
+        if expires_at > now:
+            return user, company_id
+        with _token_cache_lock:
+            _token_cache.pop(token_hash, None)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -85,12 +166,32 @@ async def get_current_user(
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username, tenant_id=tenant_id)
-    except JWTError:
+        company_claim = payload.get("company_id")
+        company_id = UUID(company_claim) if company_claim else None
+    except (JWTError, ValueError):
         raise credentials_exception
 
     user = db.query(User).filter(User.username == token_data.username).first()
     if user is None:
         raise credentials_exception
+
+    # Detach so the shared instance is never expired or refreshed by a
+    # later commit in this (or any other) request's session
+    db.expunge(user)
+    expires_at = payload.get("exp") or now + TOKEN_CACHE_TTL_SECONDS
+    with _token_cache_lock:
+        _token_cache[token_hash] = (user, company_id, expires_at)
+    return user, company_id
+
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    """Get the current authenticated user from JWT token."""
+    user, company_id = _resolve_token(token, db)
+    request.state.token_company_id = company_id
     return user
 
 
@@ -110,19 +211,8 @@ async def get_current_user_from_cookie(
     if not access_token:
         raise credentials_exception
 
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        tenant_id: str = payload.get("tenant_id")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username, tenant_id=tenant_id)
-    except JWTError:
-        raise credentials_exception
-
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
+    user, company_id = _resolve_token(access_token, db)
+    request.state.token_company_id = company_id
     return user
 
 
@@ -147,3 +237,32 @@ async def get_current_active_user(
 def get_user_tenant_id(current_user: User = Depends(get_current_active_user)) -> str:
     """Get the current user's tenant ID."""
     return str(current_user.tenant_id)
+
+
+def get_current_company_id_or_none(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+) -> Optional[UUID]:
+    """
+    Get the current user's company ID, or None if the tenant has no company.
+
+    Read from the token's company_id claim; tokens issued without the claim
+    fall back to a lookup.
+    """
+    company_id = getattr(request.state, "token_company_id", None)
+    if company_id is not None:
+        return company_id
+
+    return crud.get_primary_company_id(db, current_user.tenant_id)
+
+
+def get_current_company_id(
+    company_id: Optional[UUID] = Depends(get_current_company_id_or_none),
+) -> UUID:
+    """Get the current user's company ID, raising 400 if none exists."""
+    if company_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
+        )
+    return company_id
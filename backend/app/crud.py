@@ -1,18 +1,35 @@
 import secrets
+import threading
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import List, NamedTuple, Optional, Dict, Any, Tuple
 from uuid import UUID
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from sqlalchemy import func, insert, or_
 
 from . import models
 from . import schemas
 
 
+def _commit_or_flush(db: Session, instance: Any, commit: bool) -> None:
+    """Commit and refresh instance, or just flush so it gets its ID."""
+    if commit:
+        db.commit()
+        db.refresh(instance)
+    else:
+        db.flush()
+
+
 # User operations
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    """Create a new user."""
+def create_user(
+    db: Session, user: schemas.UserCreate, commit: bool = True
+) -> models.User:
+    """
+    Create a new user.
+
+    Pass commit=False to only flush, leaving the caller's transaction open.
+    """
     from .auth import get_password_hash
 
     db_user = models.User(
@@ -24,8 +41,7 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
         is_active=user.is_active,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    _commit_or_flush(db, db_user, commit)
     return db_user
 
 
@@ -39,13 +55,31 @@ def get_user_by_email(db: Session, email: str) -> models.User:
     return db.query(models.User).filter(models.User.email == email).first()
 
 
+def get_conflicting_users(
+    db: Session, username: str, email: str
+) -> List[Tuple[str, str]]:
+    """
+    Get (username, email) of existing users sharing the username or email.
+
+    One query replaces separate username and email lookups when registering.
+    """
+    return db.query(models.User.username, models.User.email).filter(
+        or_(models.User.username == username, models.User.email == email)
+    ).limit(2).all()
+
+
 # Tenant operations
-def create_tenant(db: Session, tenant: schemas.TenantCreate) -> models.Tenant:
-    """Create a new tenant."""
+def create_tenant(
+    db: Session, tenant: schemas.TenantCreate, commit: bool = True
+) -> models.Tenant:
+    """
+    Create a new tenant.
+
+    Pass commit=False to only flush, leaving the caller's transaction open.
+    """
     db_tenant = models.Tenant(**tenant.dict())
     db.add(db_tenant)
-    db.commit()
-    db.refresh(db_tenant)
+    _commit_or_flush(db, db_tenant, commit)
     return db_tenant
 
 
@@ -55,12 +89,19 @@ def get_tenant_by_domain(db: Session, domain: str) -> models.Tenant:
 
 
 # Company operations
-def create_company(db: Session, company: schemas.CompanyCreate) -> models.Company:
-    """Create a new company."""
+def create_company(
+    db: Session, company: schemas.CompanyCreate, commit: bool = True
+) -> models.Company:
+    """
+    Create a new company.
+
+    Pass commit=False to only flush, leaving the caller's transaction open.
+    """
     db_company = models.Company(**company.dict())
     db.add(db_company)
-    db.commit()
-    db.refresh(db_company)
+    _commit_or_flush(db, db_company, commit)
+    with _primary_company_cache_lock:
+        _primary_company_cache.pop(db_company.tenant_id, None)
     return db_company
 
 
@@ -69,6 +110,46 @@ def get_companies_by_tenant(db: Session, tenant_id: UUID) -> List[models.Company
     return db.query(models.Company).filter(models.Company.tenant_id == tenant_id).all()
 
 
+# Most endpoints only need the tenant's first company ID, so the mapping is
+# cached briefly. create_company invalidates it in this process.
+PRIMARY_COMPANY_CACHE_TTL_SECONDS = 60
+_primary_company_cache: "TTLCache[UUID, UUID]" = TTLCache(
+    maxsize=4096, ttl=PRIMARY_COMPANY_CACHE_TTL_SECONDS
+)
+_primary_company_cache_lock = threading.Lock()
+
+
+def get_primary_company_id(db: Session, tenant_id: UUID) -> Optional[UUID]:
+    """
+    Get the ID of the tenant's primary (first) company.
+
+    Tenants without a company are not cached, so a company created by
+    another process is picked up on the next call.
+
+    Args:
+        db: Database session
+        tenant_id: Tenant ID
+
+    Returns:
+        Company ID if the tenant has a company, None otherwise
+    """
+    with _primary_company_cache_lock:
+        company_id = _primary_company_cache.get(tenant_id)
+    if company_id is not None:
+        return company_id
+
+    company_id = (
+        db.query(models.Company.id)
+        .filter(models.Company.tenant_id == tenant_id)
+        .limit(1)
+        .scalar()
+    )
+    if company_id is not None:
+        with _primary_company_cache_lock:
+            _primary_company_cache[tenant_id] = company_id
+    return company_id
+
+
 # Price Profile operations
 def create_price_profile(db: Session, profile_data: dict) -> models.PriceProfile:
     """Create a new price profile."""
@@ -85,41 +166,48 @@ def create_quote(db: Session, tenant_id: UUID, user_id: UUID, data: dict) -> str
     # Generate unique public token for customer access
     public_token = secrets.token_hex(16)  # 32-character hex string
 
-    q = models.Quote(
-        tenant_id=tenant_id,
-        company_id=data["company_id"],
-        user_id=user_id,
-        customer_name=data["customer_name"],
-        project_name=data.get("project_name"),
-        profile_id=data["profile_id"],
-        currency=data.get("currency", "SEK"),
-        subtotal=data["subtotal"],
-        vat=data["vat"],
-        total=data["total"],
-        public_token=public_token,
+    # The id is generated client-side, so neither insert needs a flush or
+    # RETURNING round-trip to learn it
+    quote_id = models.uuid7()
+    db.execute(
+        insert(models.Quote),
+        {
+            "id": quote_id,
+            "tenant_id": tenant_id,
+            "company_id": data["company_id"],
+            "user_id": user_id,
+            "customer_name": data["customer_name"],
+            "project_name": data.get("project_name"),
+            "profile_id": data["profile_id"],
+            "currency": data.get("currency", "SEK"),
+            "subtotal": data["subtotal"],
+            "vat": data["vat"],
+            "total": data["total"],
+            "public_token": public_token,
+        },
     )
-    db.add(q)
-    db.flush()
-
-    # Create quote items
-    for item in data["items"]:
-        qi = models.QuoteItem(
-            quote_id=q.id,
-            kind=item["kind"],
-            ref=item.get("ref"),
-            description=item.get("description"),
-            qty=item["qty"],
-            unit=item.get("unit"),
-            unit_price=item["unit_price"],
-            line_total=item["unit_price"] * item["qty"],
-            is_optional=item.get("is_optional", False),
-            option_group=item.get("option_group"),
-        )
-        db.add(qi)
+
+    # Create quote items in one multi-row INSERT
+    items = [
+        {
+            "quote_id": quote_id,
+            "kind": item["kind"],
+            "ref": item.get("ref"),
+            "description": item.get("description"),
+            "qty": item["qty"],
+            "unit": item.get("unit"),
+            "unit_price": item["unit_price"],
+            "line_total": item["unit_price"] * item["qty"],
+            "is_optional": item.get("is_optional", False),
+            "option_group": item.get("option_group"),
+        }
+        for item in data["items"]
+    ]
+    if items:
+        db.execute(insert(models.QuoteItem), items)
 
     db.commit()
-    db.refresh(q)
-    return str(q.id)
+    return str(quote_id)
 
 
 def get_quote_by_id_and_tenant(
@@ -184,6 +272,153 @@ def get_quote_by_public_token(db: Session, public_token: str) -> Optional[models
     )
 
 
+class QuoteRef(NamedTuple):
+    """Identifying fields of a quote, as cached for public token lookups."""
+
+    id: UUID
+    tenant_id: UUID
+    company_id: UUID
+    status: str
+
+
+# Public tokens are hit repeatedly (e.g. tracking pixel reloads), so the
+# minimal quote reference is cached briefly. Status-changing endpoints
+# invalidate their token; other worker processes catch up within the TTL.
+PUBLIC_TOKEN_CACHE_TTL_SECONDS = 30
+_public_token_cache: "TTLCache[str, QuoteRef]" = TTLCache(
+    maxsize=10000, ttl=PUBLIC_TOKEN_CACHE_TTL_SECONDS
+)
+_public_token_cache_lock = threading.Lock()
+
+
+def get_quote_ref_by_public_token(db: Session, public_token: str) -> Optional[QuoteRef]:
+    """
+    Get a quote's identifying fields by public token, using a short TTL cache.
+
+    Misses are not cached.
+
+    Args:
+        db: Database session
+        public_token: Public token to look up
+
+    Returns:
+        QuoteRef if found, None otherwise
+    """
+    with _public_token_cache_lock:
+        ref = _public_token_cache.get(public_token)
+    if ref is not None:
+        return ref
+
+    row = (
+        db.query(
+            models.Quote.id,
+            models.Quote.tenant_id,
+            models.Quote.company_id,
+            models.Quote.status,
+        )
+        .filter(models.Quote.public_token == public_token)
+        .first()
+    )
+    if row is None:
+        return None
+
+    ref = QuoteRef(*row)
+    with _public_token_cache_lock:
+        _public_token_cache[public_token] = ref
+    return ref
+
+
+def invalidate_public_token(public_token: str) -> None:
+    """Drop a cached public token lookup after the quote has changed."""
+    with _public_token_cache_lock:
+        _public_token_cache.pop(public_token, None)
+
+
+def get_public_quote_bundle(db: Session, public_token: str) -> Optional[models.Quote]:
+    """
+    Get quote by public token with everything the public view renders.
+
+    Company name, items, packages and project requirements are eager-loaded,
+    so building the public response needs no further queries.
+
+    Args:
+        db: Database session
+        public_token: Public token to look up
+
+    Returns:
+        Quote instance with related rows loaded if found, None otherwise
+    """
+    return (
+        db.query(models.Quote)
+        .options(
+            joinedload(models.Quote.company).load_only(models.Company.name),
+            selectinload(models.Quote.items),
+            selectinload(models.Quote.packages),
+            selectinload(models.Quote.project_requirements),
+            raiseload("*"),
+        )
+        .filter(models.Quote.public_token == public_token)
+        .first()
+    )
+
+
+def get_quote_for_pdf(
+    db: Session, quote_id: UUID, tenant_id: UUID
+) -> Optional[models.Quote]:
+    """
+    Get quote with company, price profile and items eager-loaded for PDF output.
+
+    Multi-tenant security: Only returns quotes belonging to the tenant.
+
+    Args:
+        db: Database session
+        quote_id: Quote ID to retrieve
+        tenant_id: Tenant ID for validation
+
+    Returns:
+        Quote instance with company, profile and items loaded, None otherwise
+    """
+    return (
+        db.query(models.Quote)
+        .options(
+            joinedload(models.Quote.company),
+            joinedload(models.Quote.profile),
+            selectinload(models.Quote.items),
+            raiseload("*"),
+        )
+        .filter(models.Quote.id == quote_id, models.Quote.tenant_id == tenant_id)
+        .first()
+    )
+
+
+def get_quote_with_items_by_public_token(
+    db: Session, public_token: str
+) -> Optional[models.Quote]:
+    """
+    Get quote by public token with its items and price profile eager-loaded.
+
+    Used by public endpoints that recalculate totals, so the items and the
+    profile VAT rate arrive without extra round-trips.
+
+    Args:
+        db: Database session
+        public_token: Public token to look up
+
+    Returns:
+        Quote instance with items and profile loaded if found, None otherwise
+    """
+    return (
+        db.query(models.Quote)
+        .options(
+            selectinload(models.Quote.items),
+            joinedload(models.Quote.profile).load_only(models.PriceProfile.vat_rate),
+            raiseload("*"),
+        )
+        .filter(models.Quote.public_token == public_token)
+        .first()
+    )
+
+
 def get_quote_with_events(db: Session, quote_id: UUID, tenant_id: UUID) -> Optional[models.Quote]:
     """
     Get quote with all its events, tenant-scoped.
@@ -233,18 +468,6 @@ def get_quote_packages(db: Session, quote_id: UUID) -> List[models.QuotePackage]
     ).all()
 
 
-def update_quote_accepted_package(
-    db: Session, quote_id: UUID, package_id: UUID
-) -> Optional[models.Quote]:
-    """Update the accepted package for a quote."""
-    quote = db.query(models.Quote).filter(models.Quote.id == quote_id).first()
-    if quote:
-        quote.accepted_package_id = package_id
-        db.commit()
-        db.refresh(quote)
-    return quote
-
-
 def generate_quote_packages(
     db: Session, quote_id: UUID, tenant_id: UUID, package_names: List[str], discount_percentages: Optional[List[Decimal]] = None
 ) -> List[models.QuotePackage]:
@@ -315,8 +538,23 @@ def generate_quote_packages(
 
 
 # Quote Event operations
+def _quote_event_row(
+    event: schemas.QuoteEventCreate, company_id: UUID
+) -> Dict[str, Any]:
+    """Map an event schema onto the quote_event columns."""
+    return {
+        "quote_id": event.quote_id,
+        "company_id": company_id,
+        "event_type": event.type,
+        "meta": event.meta,
+    }
+
+
 def create_quote_event(
-    db: Session, event_data: schemas.QuoteEventCreate
+    db: Session,
+    event_data: schemas.QuoteEventCreate,
+    commit: bool = True,
+    company_id: Optional[UUID] = None,
 ) -> models.QuoteEvent:
     """
     Create new quote event.
@@ -324,17 +562,68 @@ def create_quote_event(
     Args:
         db: Database session
         event_data: Event data from request
+        commit: Commit immediately; pass False to only flush so the event is
+            written in the caller's transaction (e.g. with a status change)
+        company_id: Company owning the quote; looked up from the quote when
+            the caller doesn't already have it
 
     Returns:
         Created QuoteEvent instance
+
+    Raises:
+        ValueError: If the quote does not exist
     """
-    db_event = models.QuoteEvent(**event_data.dict())
+    if company_id is None:
+        company_id = (
+            db.query(models.Quote.company_id)
+            .filter(models.Quote.id == event_data.quote_id)
+            .limit(1)
+            .scalar()
+        )
+        if company_id is None:
+            raise ValueError(f"Quote {event_data.quote_id} not found")
+    db_event = models.QuoteEvent(**_quote_event_row(event_data, company_id))
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    _commit_or_flush(db, db_event, commit)
     return db_event
 
 
+def create_quote_events(
+    db: Session, events: List[schemas.QuoteEventCreate]
+) -> int:
+    """
+    Insert several quote events in one statement and commit once.
+
+    The owning company of every quote is looked up in a single query, since
+    events only carry the quote ID. Events for quotes that no longer exist
+    are skipped.
+
+    Args:
+        db: Database session
+        events: Events to store
+
+    Returns:
+        Number of events inserted
+    """
+    if not events:
+        return 0
+    company_ids = dict(
+        db.query(models.Quote.id, models.Quote.company_id)
+        .filter(models.Quote.id.in_({event.quote_id for event in events}))
+        .all()
+    )
+    rows = [
+        _quote_event_row(event, company_ids[event.quote_id])
+        for event in events
+        if event.quote_id in company_ids
+    ]
+    if not rows:
+        return 0
+    db.execute(insert(models.QuoteEvent), rows)
+    db.commit()
+    return len(rows)
+
+
 def get_quote_events(
     db: Session, quote_id: UUID, tenant_id: UUID
 ) -> List[models.QuoteEvent]:
@@ -526,6 +815,23 @@ def delete_project_requirements(
 
 
 # Generation Rule CRUD operations
+
+# Rules change rarely but are read on every auto-generate call, so lookups by
+# (company_id, key) are cached briefly. Edits through this module invalidate
+# the entry; other worker processes see them once the TTL expires.
+GENERATION_RULE_CACHE_TTL_SECONDS = 300
+_generation_rule_cache: "TTLCache[Tuple[UUID, str], models.GenerationRule]" = TTLCache(
+    maxsize=1024, ttl=GENERATION_RULE_CACHE_TTL_SECONDS
+)
+_generation_rule_cache_lock = threading.Lock()
+
+
+def _invalidate_generation_rule(company_id: UUID, key: str) -> None:
+    """Drop a cached generation rule after it has been changed."""
+    with _generation_rule_cache_lock:
+        _generation_rule_cache.pop((company_id, key), None)
+
+
 def create_generation_rule(
     db: Session, company_id: UUID, key: str, rules: Dict
 ) -> models.GenerationRule:
@@ -538,17 +844,34 @@ def create_generation_rule(
     db.add(generation_rule)
     db.commit()
     db.refresh(generation_rule)
+    _invalidate_generation_rule(company_id, key)
     return generation_rule
 
 
 def get_generation_rule_by_key(
     db: Session, company_id: UUID, key: str
 ) -> Optional[models.GenerationRule]:
-    """Get a generation rule by key for a specific company."""
-    return db.query(models.GenerationRule).filter(
+    """
+    Get a generation rule by key for a specific company.
+
+    Found rules are cached and returned detached from the session, so
+    callers must treat them as read-only. Misses are not cached.
+    """
+    cache_key = (company_id, key)
+    with _generation_rule_cache_lock:
+        rule = _generation_rule_cache.get(cache_key)
+    if rule is not None:
+        return rule
+
+    rule = db.query(models.GenerationRule).filter(
         models.GenerationRule.company_id == company_id,
         models.GenerationRule.key == key
     ).first()
+    if rule is not None:
+        db.expunge(rule)
+        with _generation_rule_cache_lock:
+            _generation_rule_cache[cache_key] = rule
+    return rule
 
 
 def get_generation_rules_by_company(
@@ -581,6 +904,7 @@ def update_generation_rule(
         rule.rules = rule_update.rules
         db.commit()
         db.refresh(rule)
+        _invalidate_generation_rule(rule.company_id, rule.key)
     
     return rule
 
@@ -595,8 +919,10 @@ def delete_generation_rule(
     ).first()
     
     if rule:
+        key = rule.key
         db.delete(rule)
         db.commit()
+        _invalidate_generation_rule(company_id, key)
         return True
     
     return False
@@ -627,6 +953,31 @@ def create_quote_adjustment_log(
     return adjustment_log
 
 
+def create_quote_adjustment_logs(
+    db: Session, company_id: UUID, adjustments: List[Dict[str, Any]]
+) -> int:
+    """
+    Insert several quote adjustment log entries in one statement.
+
+    Args:
+        db: Database session
+        company_id: Company ID for multi-tenancy
+        adjustments: Dicts with quote_id, item_ref, old_qty, new_qty and
+            optionally reason
+
+    Returns:
+        Number of entries inserted
+    """
+    if not adjustments:
+        return 0
+    db.execute(
+        insert(models.QuoteAdjustmentLog),
+        [{**adjustment, "company_id": company_id} for adjustment in adjustments],
+    )
+    db.commit()
+    return len(adjustments)
+
+
 def get_adjustment_logs_by_quote(
     db: Session, quote_id: UUID, company_id: UUID
 ) -> List[models.QuoteAdjustmentLog]:
@@ -723,24 +1074,36 @@ def delete_tuning_stat(
 
 
 # Labor Rate and Material CRUD operations for rule testing
-def get_labor_rate_by_code(
-    db: Session, company_id: UUID, code: str
-) -> Optional[models.LaborRate]:
-    """Get a labor rate by code for a company."""
-    return db.query(models.LaborRate).filter(
+def get_labor_rates_by_codes(
+    db: Session, company_id: UUID, codes: List[str]
+) -> Dict[str, models.LaborRate]:
+    """Get a company's labor rates for several codes in one query, keyed by code."""
+    if not codes:
+        return {}
+    rates = db.query(models.LaborRate).filter(
         models.LaborRate.company_id == company_id,
-        models.LaborRate.code == code
-    ).first()
-
-
-def get_material_by_code(
-    db: Session, company_id: UUID, code: str
-) -> Optional[models.Material]:
-    """Get a material by code for a company."""
-    return db.query(models.Material).filter(
+        models.LaborRate.code.in_(codes)
+    ).all()
+    by_code: Dict[str, models.LaborRate] = {}
+    for rate in rates:
+        by_code.setdefault(rate.code, rate)
+    return by_code
+
+
+def get_materials_by_skus(
+    db: Session, company_id: UUID, skus: List[str]
+) -> Dict[str, models.Material]:
+    """Get a company's materials for several SKUs in one query, keyed by SKU."""
+    if not skus:
+        return {}
+    materials = db.query(models.Material).filter(
         models.Material.company_id == company_id,
-        models.Material.code == code
-    ).first()
+        models.Material.sku.in_(skus)
+    ).all()
+    by_sku: Dict[str, models.Material] = {}
+    for material in materials:
+        by_sku.setdefault(material.sku, material)
+    return by_sku
 
 
 # Option Groups CRUD operations
@@ -866,16 +1229,18 @@ def update_quote_options(
     quote.total = new_total
     quote.updated_at = func.now()
     
-    db.commit()
-    db.refresh(quote)
-    
-    return {
+    # Build the result before committing; expired attributes would otherwise
+    # reload the quote and every selected item after the commit
+    result = {
         "quote_id": str(quote.id),
         "new_total": float(new_total),
         "base_total": float(base_subtotal),
         "optional_total": float(optional_subtotal),
         "selected_items": [str(item.id) for item in selected_optional_items]
     }
+    db.commit()
+    
+    return result
 
 
 def _get_option_group_title(group_name: str) -> str:
@@ -5,6 +5,8 @@ Implements double-submit CSRF token pattern for protecting against
 Cross-Site Request Forgery attacks.
 """
 
+import base64
+import binascii
 import secrets
 import hashlib
 import hmac
@@ -42,24 +44,38 @@ class CSRFProtection:
         """
         Generate a new CSRF token.
         
+        The token is 16 random bytes followed by the first 16 bytes of their
+        HMAC-SHA256 signature, URL-safe base64 encoded without padding.
+        
         Returns:
-            Base64-encoded CSRF token
+            Base64-encoded CSRF token (43 characters)
         """
-        # Generate random bytes
-        random_bytes = secrets.token_bytes(32)
-        
-        # Create HMAC signature
-        signature = hmac.new(
-            self.secret_key,
-            random_bytes,
-            hashlib.sha256
-        ).digest()
-        
-        # Combine random bytes and signature
-        token_bytes = random_bytes + signature
+        random_bytes = secrets.token_bytes(16)
+        token_bytes = random_bytes + self._sign(random_bytes)
+        return base64.urlsafe_b64encode(token_bytes).rstrip(b'=').decode('ascii')
+    
+    def is_valid_token(self, token: str) -> bool:
+        """
+        Check that a token was issued by this server.
         
-        # Return base64 encoded token
-        return secrets.token_urlsafe(len(token_bytes))[:43]  # 43 chars for URL-safe base64
+        Args:
+            token: Token to verify
+            
+        Returns:
+            True if the token is well-formed and its signature matches
+        """
+        if len(token) != 43:
+            return False
+        try:
+            token_bytes = base64.urlsafe_b64decode(token + '=')
+        except (ValueError, binascii.Error):
+            return False
+        random_bytes, signature = token_bytes[:16], token_bytes[16:]
+        return hmac.compare_digest(signature, self._sign(random_bytes))
+    
+    def _sign(self, random_bytes: bytes) -> bytes:
+        """Return the truncated HMAC-SHA256 signature of the random part."""
+        return hmac.new(self.secret_key, random_bytes, hashlib.sha256).digest()[:16]
     
     def validate_token(self, cookie_token: Optional[str], header_token: Optional[str]) -> bool:
         """
@@ -80,29 +96,11 @@ class CSRFProtection:
             return False
             
         # Validate token format and signature
-        return self._verify_token_signature(cookie_token)
-    
-    def _verify_token_signature(self, token: str) -> bool:
-        """
-        Verify that a token has a valid signature.
-        
-        Args:
-            token: Token to verify
-            
-        Returns:
-            True if signature is valid, False otherwise
-        """
-        try:
-            # Decode token
-            token_bytes = secrets.token_bytes(32)  # We'll use length validation instead
-            
-            # For simplicity in this implementation, we'll just check token format
-            # In production, you'd want to properly decode and verify the HMAC
-            return len(token) == 43 and token.replace('-', '').replace('_', '').isalnum()
-            
-        except Exception:
-            return False
+        return self.is_valid_token(cookie_token)
+
 
+# HTTP methods that never need a CSRF token
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'TRACE'})
 
 # Global CSRF protection instance
 csrf_protection = CSRFProtection("your-csrf-secret-key-change-in-production")
@@ -164,4 +162,4 @@ def is_safe_method(method: str) -> bool:
     Returns:
         True if method is safe, False otherwise
     """
-    return method.upper() in ['GET', 'HEAD', 'OPTIONS', 'TRACE']
+    return method.upper() in SAFE_METHODS
@@ -1,10 +1,34 @@
 import os
 
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg://app:app@db:5432/quotes")
-engine = create_engine(DATABASE_URL, future=True)
+
+# Connection pool sizing; the defaults (5 + 10 overflow) serialize requests
+# on pool checkout under moderate concurrency.
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),
+    "pool_pre_ping": True,
+}
+
+
+def _json_dumps(value) -> str:
+    """Serialize JSON/JSONB bind values with orjson instead of json.dumps."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+engine = create_engine(
+    DATABASE_URL,
+    future=True,
+    json_serializer=_json_dumps,
+    json_deserializer=orjson.loads,
+    **({} if DATABASE_URL.startswith("sqlite") else POOL_OPTIONS),
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
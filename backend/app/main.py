@@ -1,31 +1,37 @@
+import logging
 import os
-# import tempfile  # Temporarily disabled
+import secrets
 import time
-import traceback
 import uuid
+import warnings
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Any, Dict, List
+from functools import partial
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
 import jinja2
-from fastapi import Depends, FastAPI, HTTPException, status, Response, Request
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, status, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import CSRF protection
 from .csrf import get_csrf_token
-from .middleware import CSRFMiddleware, SecurityHeadersMiddleware
-from .rate_limiting import apply_rate_limits, rate_limit_10_per_minute
+from .middleware import SecurityMiddleware
+from .rate_limiting import BucketTimeRateLimit, apply_rate_limits, rate_limit_10_per_minute
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-# from .pdf_generator import pdf_generator  # Temporarily disabled for testing
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, configure_mappers, selectinload
 
-from . import auth, crud, schemas
+from . import auth, crud, schemas, tasks
 from .auto_tuning import create_auto_tuning_engine
-from .db import Base, engine, get_db
-from .models import Company, LaborRate, Material, PriceProfile, Tenant, User, Quote, QuotePackage, QuoteAdjustmentLog, QuoteItem
-from .pricing import calc_totals
-from .rules_eval import create_rules_evaluator
+from .db import Base, SessionLocal, engine, get_db
+from .logging_config import configure_logging, shutdown_logging
+from .models import Company, Material, PriceProfile, Tenant, User, Quote, QuotePackage, QuoteAdjustmentLog, QuoteItem
+from .pdf_generator import get_pdf_pool, pdf_generator, render_pdf, shutdown_pdf_pool
+from .pricing import calc_item_totals
+from .responses import ORJSONResponse
+from .rules_eval import create_rules_evaluator, get_requirements_evaluator, get_rule_items
+from .tuning import create_tuning_helper
 
 # Sentry configuration - temporarily disabled for debugging
 # import sentry_sdk
@@ -44,22 +50,31 @@ from .rules_eval import create_rules_evaluator
 #     ],
 # )
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Public base URLs used in quote emails, resolved once at startup
+PUBLIC_APP_URL = os.getenv("PUBLIC_APP_URL", "http://localhost:3000")
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "http://localhost:8000")
+
 app = FastAPI(title="Offert API")
 
-# CORS middleware
+# CORS middleware. Explicit lists (no wildcards) let Starlette build the
+# preflight response headers once instead of echoing them per request.
+CORS_ALLOWED_ORIGINS = ["http://localhost:3000", "http://frontend:3000"]
+CORS_ALLOWED_METHODS = ["GET", "POST", "PUT", "DELETE"]
+CORS_ALLOWED_HEADERS = ["Authorization", "Content-Type", "X-CSRF-Token"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://frontend:3000"],
+    allow_origins=CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=CORS_ALLOWED_METHODS,
+    allow_headers=CORS_ALLOWED_HEADERS,
 )
 
-# CSRF protection middleware
-app.add_middleware(CSRFMiddleware)
-
-# Security headers middleware
-app.add_middleware(SecurityHeadersMiddleware)
+# CSRF protection and security headers, in one middleware layer
+app.add_middleware(SecurityMiddleware)
 
 # Apply rate limiting
 apply_rate_limits(app)
@@ -68,82 +83,116 @@ apply_rate_limits(app)
 template_loader = jinja2.FileSystemLoader(searchpath="./templates")
 template_env = jinja2.Environment(loader=template_loader, autoescape=True)
 
-# Simple in-memory cache for rate-limiting opened events
-# In production, use Redis or similar for distributed rate-limiting
-_opened_events_cache = {}  # token -> last_opened_timestamp
+# Minimal 1x1 transparent PNG served by the tracking pixel endpoint
+_TRACKING_PIXEL_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
+    b"\x08\x02\x00\x00\x00\x90wS\xde\x00\x00\x00\x0cIDAT\x08\x99\x01\x01"
+    b"\x00\x00\x00\xff\xff\x00\x00\x00\x02\x00\x01\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+_PIXEL_HEADERS = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+_PIXEL_RESPONSE_KW = {"media_type": "image/png", "headers": _PIXEL_HEADERS}
+
+# Rate-limit "opened" events to one per token per window
+OPENED_EVENT_WINDOW_SECONDS = 600
+_opened_events_limiter = BucketTimeRateLimit(
+    window_seconds=OPENED_EVENT_WINDOW_SECONDS, num_buckets=10
+)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and seed data on startup."""
+    # Started before any DB work so buffered events are flushed even if the
+    # database is unreachable at boot
+    tasks.quote_event_buffer.start()
+
     try:
+        # Resolve all mapper relationships now rather than on the first query
+        configure_mappers()
+
         # Create tables
         Base.metadata.create_all(engine)
-        print("Database tables created successfully")
+        logger.info("Database tables created successfully")
+        logger.info("Database pool: %s", engine.pool.status())
 
         # Seed initial data
         await seed_initial_data()
 
-    except Exception as e:
-        print(f"Error during startup: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error during startup")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker processes and flush buffered events and logs on shutdown."""
+    tasks.quote_event_buffer.stop()
+    shutdown_pdf_pool()
+    shutdown_logging()
 
 
 async def seed_initial_data():
     """Seed initial tenant, user, company, and price profile."""
-    from .db import SessionLocal
-    db = SessionLocal()
-    try:
-        # Check if we already have data
-        existing_tenant = db.query(Tenant).first()
-        if existing_tenant:
-            print("✅ Tenant already exists, skipping seed")
-            return
-
-        # Create default tenant
-        default_tenant = crud.create_tenant(
-            db, schemas.TenantCreate(name="Default Company", domain="default.local")
-        )
-        print(f"✅ Created tenant: {default_tenant.name}")
-
-        # Create default user
-        default_user = crud.create_user(
-            db,
-            schemas.UserCreate(
-                email="admin@example.com",
-                username="admin",
-                password="admin123",  # Change this in production!
-                full_name="Default Administrator",
-                tenant_id=default_tenant.id,
-            ),
-        )
-        print(f"✅ Created user: {default_user.username}")
-
-        # Create default company
-        default_company = crud.create_company(
-            db,
-            schemas.CompanyCreate(
-                name="Default Company AB", tenant_id=default_tenant.id
-            ),
-        )
-        print(f"✅ Created company: {default_company.name}")
-
-        # Create default price profile
-        default_profile = PriceProfile(
-            company_id=default_company.id,
-            name="Standard",
-            currency="SEK",
-            vat_rate=25.00,
-        )
-        db.add(default_profile)
-        db.commit()
-        print(f"✅ Created price profile: {default_profile.name}")
+    with SessionLocal() as db:
+        try:
+            # Check if we already have data
+            existing_tenant_id = db.query(Tenant.id).limit(1).scalar()
+            if existing_tenant_id:
+                logger.info("✅ Tenant already exists, skipping seed")
+                return
+
+            # Create all defaults in one transaction; the helpers only flush.
+            # The tenant insert is ON CONFLICT DO NOTHING, so when several
+            # workers start at once only the one that inserts it seeds the rest.
+            default_tenant_id = db.execute(
+                pg_insert(Tenant)
+                .values(name="Default Company", domain="default.local")
+                .on_conflict_do_nothing()
+                .returning(Tenant.id)
+            ).scalar()
+            if default_tenant_id is None:
+                db.rollback()
+                logger.info("✅ Tenant seeded by another worker, skipping seed")
+                return
+
+            default_user = crud.create_user(
+                db,
+                schemas.UserCreate(
+                    email="admin@example.com",
+                    username="admin",
+                    password="admin123",  # Change this in production!
+                    full_name="Default Administrator",
+                    tenant_id=default_tenant_id,
+                ),
+                commit=False,
+            )
+            default_company = crud.create_company(
+                db,
+                schemas.CompanyCreate(
+                    name="Default Company AB", tenant_id=default_tenant_id
+                ),
+                commit=False,
+            )
+            default_profile = PriceProfile(
+                company_id=default_company.id,
+                name="Standard",
+                currency="SEK",
+                vat_rate=25.00,
+            )
+            db.add(default_profile)
+            db.commit()
 
-    except Exception as e:
-        print(f"Error seeding data: {e}")
-        traceback.print_exc()
-    finally:
-        db.close()
+            logger.info("✅ Created tenant: Default Company")
+            logger.info("✅ Created user: %s", default_user.username)
+            logger.info("✅ Created company: %s", default_company.name)
+            logger.info("✅ Created price profile: %s", default_profile.name)
+
+        except Exception:
+            db.rollback()
+            logger.exception("Error seeding data")
 
 
 @app.get("/")
@@ -174,7 +223,6 @@ def healthz_check():
         curl http://localhost:8000/healthz
         {"ok": true, "status": "alive", "timestamp": "2024-01-15T10:30:00Z"}
     """
-    from datetime import datetime
     return {
         "ok": True, 
         "status": "alive",
@@ -200,8 +248,6 @@ def readiness_check(db: Session = Depends(get_db)):
         {"ok": true, "status": "ready", "database": "connected", "timestamp": "2024-01-15T10:30:00Z"}
     """
     try:
-        from datetime import datetime
-        
         # Test database connection by executing a simple query
         result = db.execute("SELECT 1 as health_check").fetchone()
         
@@ -216,11 +262,9 @@ def readiness_check(db: Session = Depends(get_db)):
             raise Exception("Database health check query failed")
             
     except Exception as e:
-        from datetime import datetime
         # Log the error for debugging
-        print(f"Readiness check failed: {e}")
+        logger.warning("Readiness check failed: %s", e)
         # Return 503 Service Unavailable
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail={
@@ -253,7 +297,7 @@ async def test_endpoint(request: Request):
 
 
 @app.post("/auth/login", response_model=schemas.LoginResponse)
-async def login(
+def login(
     login_data: schemas.LoginRequest, response: Response, db: Session = Depends(get_db)
 ):
     """Login endpoint that sets secure httpOnly cookies."""
@@ -265,13 +309,11 @@ async def login(
         )
 
     # Create access and refresh tokens
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(days=auth.REFRESH_TOKEN_EXPIRE_DAYS)
     
-    access_token = auth.create_access_token(
-        data={"sub": user.username, "tenant_id": str(user.tenant_id)},
-        expires_delta=access_token_expires,
-    )
+    # Default lifetime, so a burst of logins for the same user reuses the
+    # token signed in the current window
+    access_token = auth.create_access_token(data=auth.access_token_claims(db, user))
     
     refresh_token = auth.create_refresh_token(
         data={"sub": user.username, "tenant_id": str(user.tenant_id), "type": "refresh"},
@@ -311,7 +353,7 @@ async def login(
 
 
 @app.post("/auth/refresh", response_model=schemas.Token)
-async def refresh_access_token(
+def refresh_access_token(
     request: Request, response: Response, db: Session = Depends(get_db)
 ):
     """Refresh access token using refresh token from cookie."""
@@ -341,11 +383,7 @@ async def refresh_access_token(
         )
 
     # Create new access token
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username, "tenant_id": str(user.tenant_id)},
-        expires_delta=access_token_expires,
-    )
+    access_token = auth.create_access_token(data=auth.access_token_claims(db, user))
 
     # Set new access token cookie
     response.set_cookie(
@@ -375,11 +413,10 @@ async def logout(response: Response):
 
 # Legacy token endpoint for backward compatibility (deprecated)
 @app.post("/token", response_model=schemas.Token)
-async def login_for_access_token(
+def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
     """Legacy login endpoint - DEPRECATED: Use /auth/login instead."""
-    import warnings
     warnings.warn("This endpoint is deprecated. Use /auth/login instead.", DeprecationWarning)
     
     user = auth.authenticate_user(db, form_data.username, form_data.password)
@@ -390,18 +427,16 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username, "tenant_id": str(user.tenant_id)},
-        expires_delta=access_token_expires,
-    )
+    access_token = auth.create_access_token(data=auth.access_token_claims(db, user))
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @app.post("/users", response_model=schemas.UserOut)
-async def create_user(
-    user: schemas.UserCreate, current_user: User = Depends(auth.get_current_active_user)
+def create_user(
+    user: schemas.UserCreate,
+    current_user: User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
 ):
     """Create a new user (requires authentication)."""
     if not current_user.is_superuser:
@@ -409,24 +444,20 @@ async def create_user(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
 
-    from .db import SessionLocal
-    db = SessionLocal()
-    try:
-        # Check if username or email already exists
-        if crud.get_user_by_username(db, user.username):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered",
-            )
-        if crud.get_user_by_email(db, user.email):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
-            )
+    # Check if username or email already exists (one query for both)
+    conflicts = crud.get_conflicting_users(db, user.username, user.email)
+    if any(username == user.username for username, _ in conflicts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered",
+        )
+    if any(email == user.email for _, email in conflicts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
 
-        return crud.create_user(db, user)
-    finally:
-        db.close()
+    return crud.create_user(db, user)
 
 
 @app.get("/users/me", response_model=schemas.UserOut)
@@ -441,47 +472,25 @@ async def calc_quote(
     q: schemas.QuoteIn, current_user: User = Depends(auth.get_current_active_user)
 ):
     """Calculate quote totals (requires authentication)."""
-    items = [{"unit_price": i.unit_price, "qty": i.qty} for i in q.items]
-    subtotal, vat, total = calc_totals(items, q.vat_rate)
+    subtotal, vat, total = calc_item_totals(q.items, q.vat_rate)
     return {"subtotal": float(subtotal), "vat": float(vat), "total": float(total)}
 
 
 @app.post("/quotes", response_model=Dict)
-async def create_quote(
+def create_quote(
     q: schemas.QuoteIn,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """Create a new quote (requires authentication)."""
-
-    # Get the user's company
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
-
-    items = [
-        {
-            "kind": i.kind,
-            "ref": i.ref,
-            "description": i.description,
-            "qty": i.qty,
-            "unit": i.unit,
-            "unit_price": i.unit_price,
-        }
-        for i in q.items
-    ]
-    subtotal, vat, total = calc_totals(
-        [{"unit_price": i["unit_price"], "qty": i["qty"]} for i in items], q.vat_rate
-    )
+    subtotal, vat, total = calc_item_totals(q.items, q.vat_rate)
+    items = [i.model_dump() for i in q.items]
 
     quote_id = crud.create_quote(
         db,
-        str(current_user.tenant_id),
-        str(current_user.id),
+        current_user.tenant_id,
+        current_user.id,
         {
             "customer_name": q.customer_name,
             "project_name": q.project_name,
@@ -512,7 +521,7 @@ async def create_quote(
 
 
 @app.get("/quotes", response_model=List[schemas.QuoteOut])
-async def get_quotes(
+def get_quotes(
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -522,7 +531,7 @@ async def get_quotes(
 
 
 @app.get("/companies", response_model=List[schemas.Company])
-async def get_companies(
+def get_companies(
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -531,44 +540,39 @@ async def get_companies(
     return companies
 
 
-@app.get("/price-profiles")
-async def get_price_profiles(
+@app.get("/price-profiles", response_model=List[schemas.PriceProfileOut])
+def get_price_profiles(
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: Optional[UUID] = Depends(auth.get_current_company_id_or_none),
     db: Session = Depends(get_db),
 ):
     """Get all price profiles for the current user's company."""
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
+    if company_id is None:
         return []
 
-    company_id = companies[0].id
-
-    # Get price profiles for this company
-    profiles = (
-        db.query(PriceProfile).filter(PriceProfile.company_id == company_id).all()
+    # Get price profiles for this company (only the columns we return)
+    rows = (
+        db.query(
+            PriceProfile.id,
+            PriceProfile.name,
+            PriceProfile.company_id,
+            PriceProfile.currency,
+            PriceProfile.vat_rate,
+        )
+        .filter(PriceProfile.company_id == company_id)
+        .all()
     )
 
-    # Convert to response format
-    response_profiles = []
-    for profile in profiles:
-        response_profiles.append(
-            {
-                "id": str(profile.id),
-                "name": profile.name,
-                "company_id": str(profile.company_id),
-                "currency": profile.currency,
-                "vat_rate": float(profile.vat_rate),
-            }
-        )
-
-    return response_profiles
+    # Rows are serialized straight to JSON through the response model
+    return rows
 
 
 # Project Requirements endpoints
 @app.post("/project-requirements", response_model=schemas.ProjectRequirementsOut)
-async def create_project_requirements(
+def create_project_requirements(
     requirements: schemas.ProjectRequirementsIn,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -577,14 +581,6 @@ async def create_project_requirements(
     The company_id from the current user's context is automatically used
     to ensure proper tenant isolation.
     """
-    # Get the user's company (assuming one company per user for simplicity)
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     # Create requirements with company scoping
     db_requirements = crud.create_project_requirements(
@@ -595,8 +591,9 @@ async def create_project_requirements(
 
 
 @app.get("/project-requirements", response_model=List[schemas.ProjectRequirementsOut])
-async def get_project_requirements(
+def get_project_requirements(
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: Optional[UUID] = Depends(auth.get_current_company_id_or_none),
     db: Session = Depends(get_db),
 ):
     """
@@ -604,11 +601,9 @@ async def get_project_requirements(
 
     Multi-tenant security: Only returns requirements for the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
+    if company_id is None:
         return []
 
-    company_id = companies[0].id
     requirements = crud.get_project_requirements_by_company(db, company_id)
     return requirements
 
@@ -617,9 +612,10 @@ async def get_project_requirements(
     "/project-requirements/{requirements_id}",
     response_model=schemas.ProjectRequirementsOut,
 )
-async def get_project_requirements_by_id(
+def get_project_requirements_by_id(
     requirements_id: str,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -627,13 +623,6 @@ async def get_project_requirements_by_id(
 
     Multi-tenant security: Only returns requirements belonging to the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     requirements = crud.get_project_requirements_by_id(
         db, uuid.UUID(requirements_id), company_id
@@ -651,10 +640,11 @@ async def get_project_requirements_by_id(
     "/project-requirements/{requirements_id}",
     response_model=schemas.ProjectRequirementsOut,
 )
-async def update_project_requirements(
+def update_project_requirements(
     requirements_id: str,
     requirements: schemas.ProjectRequirementsIn,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -662,13 +652,6 @@ async def update_project_requirements(
 
     Multi-tenant security: Only allows updates to requirements belonging to the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     # Update requirements with company scoping
     updated_requirements = crud.update_project_requirements(
@@ -685,9 +668,10 @@ async def update_project_requirements(
 
 
 @app.delete("/project-requirements/{requirements_id}")
-async def delete_project_requirements(
+def delete_project_requirements(
     requirements_id: str,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -695,13 +679,6 @@ async def delete_project_requirements(
 
     Multi-tenant security: Only allows deletion of requirements belonging to the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     success = crud.delete_project_requirements(
         db, uuid.UUID(requirements_id), company_id
@@ -715,10 +692,14 @@ async def delete_project_requirements(
     return {"message": "Project requirements deleted successfully"}
 
 
-@app.get("/quotes/{quote_id}/adjustments")
-async def get_quote_adjustments(
+@app.get(
+    "/quotes/{quote_id}/adjustments",
+    response_model=List[schemas.QuoteAdjustmentLogOut],
+)
+def get_quote_adjustments(
     quote_id: str,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -726,42 +707,19 @@ async def get_quote_adjustments(
 
     Multi-tenant security: Only returns adjustments for quotes belonging to the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     # Get adjustment logs for this quote
-    adjustments = crud.get_adjustment_logs_by_quote(db, uuid.UUID(quote_id), company_id)
-
-    # Convert to response format
-    response_adjustments = []
-    for adj in adjustments:
-        response_adjustments.append(
-            {
-                "id": str(adj.id),
-                "quote_id": str(adj.quote_id),
-                "item_ref": adj.item_ref,
-                "old_qty": str(adj.old_qty),
-                "new_qty": str(adj.new_qty),
-                "reason": adj.reason,
-                "created_at": adj.created_at,
-            }
-        )
-
-    return response_adjustments
+    return crud.get_adjustment_logs_by_quote(db, uuid.UUID(quote_id), company_id)
 
 
 @app.get(
     "/quotes/{quote_id}/project-requirements",
     response_model=schemas.ProjectRequirementsOut,
 )
-async def get_project_requirements_by_quote(
+def get_project_requirements_by_quote(
     quote_id: str,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -769,13 +727,6 @@ async def get_project_requirements_by_quote(
 
     Multi-tenant security: Only returns requirements for quotes belonging to the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     requirements = crud.get_project_requirements_by_quote(
         db, uuid.UUID(quote_id), company_id
@@ -790,10 +741,11 @@ async def get_project_requirements_by_quote(
 
 
 # Generation Rules endpoints
-@app.post("/generation-rules")
-async def create_generation_rule(
+@app.post("/generation-rules", response_model=schemas.GenerationRuleOut)
+def create_generation_rule(
     rule: schemas.GenerationRuleIn,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -802,36 +754,15 @@ async def create_generation_rule(
     The company_id from the current user's context is automatically used
     to ensure proper tenant isolation.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
-    # Create rule with company scoping
-    db_rule = crud.create_generation_rule(
-        db,
-        schemas.GenerationRuleCreate(
-            company_id=company_id, key=rule.key, rules=rule.rules
-        ),
-    )
-
-    # Convert to response format (datetime already converted to strings in CRUD)
-    return {
-        "id": str(db_rule.id),
-        "company_id": str(db_rule.company_id),
-        "key": db_rule.key,
-        "rules": db_rule.rules,
-        "created_at": db_rule.created_at,
-        "updated_at": db_rule.updated_at,
-    }
+    # Create rule with company scoping; serialized through the response model
+    return crud.create_generation_rule(db, company_id, rule.key, rule.rules)
 
 
-@app.get("/generation-rules")
-async def get_generation_rules(
+@app.get("/generation-rules", response_model=List[schemas.GenerationRuleOut])
+def get_generation_rules(
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: Optional[UUID] = Depends(auth.get_current_company_id_or_none),
     db: Session = Depends(get_db),
 ):
     """
@@ -839,35 +770,18 @@ async def get_generation_rules(
 
     Multi-tenant security: Only returns rules for the user's company.
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
+    if company_id is None:
         return []
 
-    company_id = companies[0].id
-    rules = crud.get_generation_rules_by_company(db, company_id)
-
-    # Convert to response format (datetime already converted to strings in CRUD)
-    response_rules = []
-    for rule in rules:
-        response_rules.append(
-            {
-                "id": str(rule.id),
-                "company_id": str(rule.company_id),
-                "key": rule.key,
-                "rules": rule.rules,
-                "created_at": rule.created_at,
-                "updated_at": rule.updated_at,
-            }
-        )
-
-    return response_rules
+    return crud.get_generation_rules_by_company(db, company_id)
 
 
 # Auto-generation endpoint
 @app.post("/quotes/autogenerate", response_model=schemas.AutoGenerateResponse)
-async def auto_generate_quote(
+def auto_generate_quote(
     request: schemas.AutoGenerateRequest,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -890,13 +804,6 @@ async def auto_generate_quote(
     - tuning_applied: List of applied tuning factors per item
     - confidence_per_item: Confidence level per item (low/med/high)
     """
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-
-    company_id = companies[0].id
 
     # Get project requirements
     requirements = crud.get_project_requirements_by_id(
@@ -908,9 +815,13 @@ async def auto_generate_quote(
             detail="Project requirements not found",
         )
 
-    # Get price profile
+    # Get price profile with its labor rates and materials eager-loaded
     profile = (
         db.query(PriceProfile)
+        .options(
+            selectinload(PriceProfile.labor_rates),
+            selectinload(PriceProfile.materials),
+        )
         .filter(
             PriceProfile.id == uuid.UUID(request.profile_id),
             PriceProfile.company_id == company_id,
@@ -933,33 +844,39 @@ async def auto_generate_quote(
             detail=f"Saknar generation_rule för '{rule_key}'. Skapa en regel för denna kombination av rumstyp och utförandenivå. Exempel: POST /generation-rules med key='{rule_key}' och lämpliga regler för labor och materials.",
         )
 
-    # Initialize rule evaluator with project requirements data
-    evaluator = create_rules_evaluator(requirements.data)
+    # Rule evaluator for the project requirements, shared per requirements version
+    evaluator = get_requirements_evaluator(requirements)
 
     # Generate items based on rules
     generated_items = []
     confidence_levels = []
 
     try:
+        labor_items, material_items = get_rule_items(generation_rule)
+
+        # Index the profile's eager-loaded prices by code/sku
+        labor_rates = {
+            rate.code: rate
+            for rate in profile.labor_rates
+            if rate.company_id == company_id
+        }
+        materials = {
+            material.sku: material
+            for material in profile.materials
+            if material.company_id == company_id
+        }
+
         # Process labor rules
-        if "labor" in generation_rule.rules:
-            for ref, expression in generation_rule.rules["labor"].items():
+        if labor_items:
+            for ref, expression in labor_items:
                 try:
                     qty = evaluator.evaluate(expression)
                 except ValueError as e:
-                    print(f"Error evaluating expression '{expression}' for labor item {ref}: {e}")
+                    logger.error("Error evaluating expression '%s' for labor item %s: %s", expression, ref, e)
                     qty = Decimal('0')
 
                 # Get labor rate for this reference
-                labor_rate = (
-                    db.query(LaborRate)
-                    .filter(
-                        LaborRate.company_id == company_id,
-                        LaborRate.profile_id == profile.id,
-                        LaborRate.code == ref,
-                    )
-                    .first()
-                )
+                labor_rate = labor_rates.get(ref)
 
                 if labor_rate:
                     unit_price = float(labor_rate.unit_price)
@@ -992,24 +909,16 @@ async def auto_generate_quote(
                 confidence_levels.append(confidence)
 
         # Process material rules
-        if "materials" in generation_rule.rules:
-            for ref, expression in generation_rule.rules["materials"].items():
+        if material_items:
+            for ref, expression in material_items:
                 try:
                     qty = evaluator.evaluate(expression)
                 except ValueError as e:
-                    print(f"Error evaluating expression '{expression}' for material item {ref}: {e}")
+                    logger.error("Error evaluating expression '%s' for material item %s: %s", expression, ref, e)
                     qty = Decimal('0')
 
                 # Get material for this reference
-                material = (
-                    db.query(Material)
-                    .filter(
-                        Material.company_id == company_id,
-                        Material.profile_id == profile.id,
-                        Material.sku == ref,
-                    )
-                    .first()
-                )
+                material = materials.get(ref)
 
                 if material:
                     # Calculate unit price with markup
@@ -1086,7 +995,7 @@ async def auto_generate_quote(
 
         except Exception as e:
             # Log error but continue without tuning
-            print(f"Auto-tuning error (non-critical): {e}")
+            logger.warning("Auto-tuning error (non-critical): %s", e)
             pass
 
         # Calculate totals
@@ -1113,7 +1022,7 @@ async def auto_generate_quote(
 
 # PDF generation endpoint (now with authentication and option handling)
 @app.post("/quotes/{quote_id}/pdf")
-async def generate_pdf(
+def generate_pdf(
     quote_id: str,
     pdf_request: schemas.GeneratePDFRequest,
     current_user: User = Depends(auth.get_current_active_user),
@@ -1136,75 +1045,59 @@ async def generate_pdf(
     ```
     """
     try:
-        # Get quote with tenant validation
-        quote = crud.get_quote_by_id_and_tenant(
+        # Two queries: quote with company and profile, then its items
+        quote = crud.get_quote_for_pdf(
             db, uuid.UUID(quote_id), current_user.tenant_id
         )
         if not quote:
             raise HTTPException(status_code=404, detail="Quote not found")
         
-        # Get companies for the user
-        companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-        if not companies:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-            )
-        
-        company = companies[0]
-        
-        # Get quote items
-        quote_items = db.query(QuoteItem).filter(
-            QuoteItem.quote_id == quote.id
-        ).all()
+        company = quote.company
+        quote_items = quote.items
         
         if not quote_items:
             raise HTTPException(
                 status_code=404, detail="No items found for this quote"
             )
         
-        # Get price profile for VAT calculation
-        profile = db.query(PriceProfile).filter(
-            PriceProfile.id == quote.profile_id
-        ).first()
+        profile = quote.profile
         
         if not profile:
             raise HTTPException(
                 status_code=404, detail="Price profile not found"
             )
         
-        # Generate PDF with selected options - Temporarily disabled
-        # pdf_bytes = pdf_generator.generate_quote_pdf(
-        #     quote=quote,
-        #     quote_items=quote_items,
-        #     selected_item_ids=pdf_request.selectedItemIds,
-        #     company=company,
-        #     profile=profile
-        # )
+        # Build HTML with selected options
+        html_content = pdf_generator.build_quote_html(
+            quote=quote,
+            quote_items=quote_items,
+            selected_item_ids=pdf_request.selectedItemIds,
+            company=company,
+            profile=profile
+        )
         
-        # if not pdf_bytes:
-        #     raise HTTPException(
-        #         status_code=501, 
-        #         detail="PDF generation failed - WeasyPrint not available"
-        #     )
+        if html_content is None:
+            raise HTTPException(
+                status_code=501, 
+                detail="PDF generation failed - WeasyPrint not available"
+            )
         
-        # Return PDF as response
-        # from fastapi.responses import Response
-        # return Response(
-        #     content=pdf_bytes,
-        #     media_type="application/pdf",
-        #     headers={
-        #         "Content-Disposition": f"attachment; filename=quote_{quote_id[:8]}.pdf"
-        #     }
-        # )
+        # Render in the PDF process pool; this worker thread only waits
+        pdf_bytes = get_pdf_pool().submit(render_pdf, html_content).result()
         
-        # Temporary response while PDF generation is disabled
-        return {"message": "PDF generation temporarily disabled", "quote_id": str(quote_id)}
+        # Return the PDF bytes straight from memory; nothing touches disk
+        return Response(
+            content=pdf_bytes,
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": f'attachment; filename="quote_{quote_id[:8]}.pdf"'
+            }
+        )
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error generating PDF: {e}")
-        traceback.print_exc()
+        logger.exception("Error generating PDF")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate PDF: {str(e)}"
@@ -1213,34 +1106,38 @@ async def generate_pdf(
 
 # Test endpoint to create a simple quote for testing
 @app.post("/test/create-quote")
-async def create_test_quote(
+def create_test_quote(
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
     """Create a test quote for testing purposes."""
     try:
-        # Get first company for the user
-        company = (
-            db.query(Company)
+        # Get first company for the user (only the ID is needed)
+        company_id = (
+            db.query(Company.id)
             .filter(Company.tenant_id == current_user.tenant_id)
-            .first()
+            .limit(1)
+            .scalar()
         )
-        if not company:
+        if not company_id:
             raise HTTPException(status_code=404, detail="No company found")
 
         # Get first price profile
-        profile = (
-            db.query(PriceProfile).filter(PriceProfile.company_id == company.id).first()
+        profile_id = (
+            db.query(PriceProfile.id)
+            .filter(PriceProfile.company_id == company_id)
+            .limit(1)
+            .scalar()
         )
-        if not profile:
+        if not profile_id:
             raise HTTPException(status_code=404, detail="No price profile found")
 
         # Create test quote
         quote_data = {
-            "company_id": str(company.id),
+            "company_id": str(company_id),
             "customer_name": "Test Customer AB",
             "project_name": "Test Project",
-            "profile_id": str(profile.id),
+            "profile_id": str(profile_id),
             "currency": "SEK",
             "subtotal": Decimal("1000.00"),
             "vat": Decimal("250.00"),
@@ -1263,8 +1160,7 @@ async def create_test_quote(
         return {"message": "Test quote created", "quote_id": quote_id}
 
     except Exception as e:
-        print(f"Error creating test quote: {e}")
-        traceback.print_exc()
+        logger.exception("Error creating test quote")
         raise HTTPException(
             status_code=500, detail=f"Failed to create test quote: {str(e)}"
         )
@@ -1272,9 +1168,10 @@ async def create_test_quote(
 
 # Quote send endpoint
 @app.post("/quotes/{quote_id}/send", response_model=schemas.QuoteSendResponse)
-async def send_quote(
+def send_quote(
     quote_id: str,
     send_request: schemas.QuoteSendRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -1296,64 +1193,35 @@ async def send_quote(
 
         # Ensure quote has a public_token, generate if missing
         if not quote.public_token:
-            import secrets
-
             quote.public_token = secrets.token_hex(16)
-            db.commit()
-            db.refresh(quote)
-            print(
-                f"Generated missing public_token for quote {quote_id}: {quote.public_token}"
+            logger.info(
+                "Generated missing public_token for quote %s: %s",
+                quote_id,
+                quote.public_token,
             )
 
         # Generate public URL
-        public_app_url = os.getenv("PUBLIC_APP_URL", "http://localhost:3000")
-        public_url = f"{public_app_url}/public/quote/{quote.public_token}"
-
-        # Send email via stub (placeholder for SendGrid integration)
-        print("📧 SENDING QUOTE EMAIL:")
-        print(f"   To: {send_request.toEmail}")
-        print(f"   Quote ID: {quote_id}")
-        print(f"   Public URL: {public_url}")
-        print(f"   Customer: {quote.customer_name}")
-        print(f"   Project: {quote.project_name}")
-        if send_request.message:
-            print(f"   Custom Message: {send_request.message}")
-        print(f"   Status: {quote.status} → SENT")
-
-        # Include tracking pixel in email stub
-        public_api_url = os.getenv("PUBLIC_API_URL", "http://localhost:8000")
-        tracking_pixel_url = f"{public_api_url}/public/pixel/{quote.public_token}.png"
-        print(f"   Tracking Pixel: {tracking_pixel_url}")
-        print(
-            f'   Email HTML would include: <img src="{tracking_pixel_url}" width="1" height="1" />'
+        public_url = f"{PUBLIC_APP_URL}/public/quote/{quote.public_token}"
+        tracking_pixel_url = f"{PUBLIC_API_URL}/public/pixel/{quote.public_token}.png"
+
+        # Email and "sent" event are handled after the response is returned.
+        # Read everything the task needs before the commit expires the quote.
+        background_tasks.add_task(
+            tasks.send_quote_email,
+            quote_id=quote.id,
+            to_email=send_request.toEmail,
+            message=send_request.message,
+            username=current_user.username,
+            public_url=public_url,
+            tracking_pixel_url=tracking_pixel_url,
+            customer_name=quote.customer_name,
+            project_name=quote.project_name,
+            sent_at=datetime.utcnow().isoformat() + "Z",
         )
 
-        # Update quote status to SENT
+        # Token and status change in a single commit
         quote.status = "SENT"
         db.commit()
-        db.refresh(quote)
-
-        # Create quote event for tracking
-        event = crud.create_quote_event(
-            db,
-            schemas.QuoteEventCreate(
-                quote_id=quote.id,
-                type="sent",
-                meta={
-                    "to": send_request.toEmail,
-                    "url": public_url,
-                    "message": send_request.message,
-                    "sent_by": current_user.username,
-                    "sent_at": (
-                        quote.updated_at.isoformat()
-                        if hasattr(quote, "updated_at")
-                        else None
-                    ),
-                },
-            ),
-        )
-
-        print(f"✅ Quote sent successfully! Event ID: {event.id}")
 
         return schemas.QuoteSendResponse(
             sent=True,
@@ -1364,14 +1232,13 @@ async def send_quote(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error sending quote: {e}")
-        traceback.print_exc()
+        logger.exception("Error sending quote")
         raise HTTPException(status_code=500, detail=f"Failed to send quote: {str(e)}")
 
 
 # Quote Package endpoints
 @app.post("/quotes/{quote_id}/packages/generate")
-async def generate_quote_packages(
+def generate_quote_packages(
     quote_id: str,
     generate_request: schemas.QuotePackageGenerateRequest,
     current_user: User = Depends(auth.get_current_active_user),
@@ -1400,7 +1267,7 @@ async def generate_quote_packages(
                 status_code=400, detail="No packages could be generated"
             )
 
-        print(f"✅ Generated {len(packages)} packages for quote {quote_id}")
+        logger.info("✅ Generated %s packages for quote %s", len(packages), quote_id)
 
         return {
             "message": f"Successfully generated {len(packages)} packages",
@@ -1411,136 +1278,99 @@ async def generate_quote_packages(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error generating quote packages: {e}")
-        traceback.print_exc()
+        logger.exception("Error generating quote packages")
         raise HTTPException(
             status_code=500, detail=f"Failed to generate packages: {str(e)}"
         )
 
 
 @app.get("/quotes/{quote_id}/packages", response_model=List[schemas.QuotePackageOut])
-async def get_quote_packages(
+def get_quote_packages(
     quote_id: str,
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
     """Get all packages for a specific quote (JWT, company-scoped)."""
     try:
-        # Get packages with tenant validation
-        packages = crud.get_quote_packages(
+        # Tenant validation, then packages for the quote
+        quote = crud.get_quote_by_id_and_tenant(
             db, uuid.UUID(quote_id), current_user.tenant_id
         )
+        if not quote:
+            raise HTTPException(status_code=404, detail="Quote not found")
 
-        if not packages:
-            return []
-
-        return [schemas.QuotePackageOut.from_orm(pkg) for pkg in packages]
+        # Validated once by the response model (items are JSONB)
+        return crud.get_quote_packages(db, quote.id)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error getting quote packages: {e}")
-        traceback.print_exc()
+        logger.exception("Error getting quote packages")
         raise HTTPException(
             status_code=500, detail=f"Failed to retrieve packages: {str(e)}"
         )
 
 
+def _event_meta(**extra) -> dict:
+    """Build public quote event metadata.
+
+    The client's IP address and user agent are not recorded.
+    """
+    return {"ip": "unknown", "user_agent": "unknown", **extra}
+
+
 # Update public quote endpoint to include packages
 @app.get("/public/quotes/{token}", response_model=schemas.PublicQuote)
-async def get_public_quote(
+def get_public_quote(
     token: str,
     db: Session = Depends(get_db),
 ):
     """Get public quote by token (no authentication required)."""
     try:
-        # Get quote by public token
-        quote = crud.get_quote_by_public_token(db, token)
+        # Quote with company in one query; items, packages and requirements
+        # each follow in one selectinload query
+        quote = crud.get_public_quote_bundle(db, token)
         if not quote:
             raise HTTPException(status_code=404, detail="Quote not found")
 
-        # Rate-limited opened event tracking (once per 10 minutes per token)
-        current_time = datetime.now().timestamp()
-        cache_key = f"opened_{token}"
-
-        if (
-            cache_key not in _opened_events_cache
-            or current_time - _opened_events_cache[cache_key] > 600
-        ):  # 10 minutes = 600 seconds
-
-            # Create opened event
-            try:
-                event = crud.create_quote_event(
-                    db,
-                    schemas.QuoteEventCreate(
-                        quote_id=quote.id,
-                        type="opened",
-                        meta={
-                            "ip": "unknown",  # Could extract from request if needed
-                            "user_agent": "unknown",  # Could extract from request if needed
-                            "opened_at": datetime.now().isoformat(),
-                        },
-                    ),
-                )
-                print(f"📖 Quote opened event created: {event.id}")
-
-                # Update cache
-                _opened_events_cache[cache_key] = current_time
-
-                # Clean up old cache entries (keep only last 1000)
-                if len(_opened_events_cache) > 1000:
-                    # Remove oldest entries
-                    sorted_cache = sorted(
-                        _opened_events_cache.items(), key=lambda x: x[1]
-                    )
-                    _opened_events_cache.clear()
-                    _opened_events_cache.update(dict(sorted_cache[-500:]))
-
-            except Exception as e:
-                print(f"Warning: Could not create opened event: {e}")
-                # Don't fail the request if event creation fails
-
-        # Get company name if available
-        company_name = None
-        try:
-            company = db.query(Company).filter(Company.id == quote.company_id).first()
-            if company:
-                company_name = company.name
-        except Exception:
-            pass  # Don't fail if company lookup fails
-
-        # Convert items to public format
-        public_items = []
-        for item in quote.items:
-            public_items.append(
-                schemas.PublicQuoteItem(
-                    kind=item.kind,
-                    description=item.description,
-                    qty=item.qty,
-                    unit=item.unit or "",
-                    unit_price=item.unit_price,
-                    line_total=item.line_total,
-                )
+        company_name = quote.company.name if quote.company else None
+
+        # Convert items to public format. Values come straight from typed
+        # columns, so skip validation; JSONB package items below are validated.
+        construct_item = schemas.PublicQuoteItem.model_construct
+        public_items = [
+            construct_item(
+                kind=item.kind,
+                description=item.description,
+                qty=item.qty,
+                unit=item.unit or "",
+                unit_price=item.unit_price,
+                line_total=item.line_total,
+                is_optional=bool(item.is_optional),
+                option_group=item.option_group,
             )
+            for item in quote.items
+        ]
 
-        # Get packages for this quote
+        # Packages for this quote
         packages = []
         try:
-            quote_packages = crud.get_quote_packages(
-                db, quote.id, quote.tenant_id
-            )
-            for pkg in quote_packages:
-                package_items = []
-                for item in pkg.items:
-                    package_items.append(
-                        schemas.PublicQuoteItem(
-                            kind=item["kind"],
-                            description=item.get("description"),
-                            qty=item["qty"],
-                            unit=item["unit"] or "",
-                            unit_price=item["unit_price"],
-                            line_total=item["line_total"],
-                        )
+            public_item = schemas.PublicQuoteItem
+            for pkg in quote.packages:
+                package_items = [
+                    public_item(
+                        kind=item["kind"],
+                        description=item.get("description"),
+                        qty=item["qty"],
+                        unit=item["unit"] or "",
+                        unit_price=item["unit_price"],
+                        line_total=item["line_total"],
+                        is_optional=item.get("is_optional", False),
+                        option_group=item.get("option_group"),
                     )
-                
+                    for item in pkg.items
+                ]
+
                 packages.append(
                     schemas.PublicQuotePackage(
                         id=pkg.id,
@@ -1553,7 +1383,7 @@ async def get_public_quote(
                     )
                 )
         except Exception as e:
-            print(f"Warning: Could not retrieve packages: {e}")
+            logger.warning("Could not retrieve packages: %s", e)
             # Don't fail the request if package retrieval fails
 
         # Get additional fields from project requirements if available
@@ -1563,8 +1393,13 @@ async def get_public_quote(
         timeline = None
 
         try:
-            requirements = crud.get_project_requirements_by_quote(
-                db, quote.id, quote.company_id
+            requirements = next(
+                (
+                    req
+                    for req in quote.project_requirements
+                    if req.company_id == quote.company_id
+                ),
+                None,
             )
             if requirements and requirements.data:
                 data = requirements.data
@@ -1575,7 +1410,7 @@ async def get_public_quote(
         except Exception:
             pass  # Don't fail if requirements lookup fails
 
-        return schemas.PublicQuote(
+        public_quote = schemas.PublicQuote(
             company_name=company_name,
             project_name=quote.project_name,
             customer_name=quote.customer_name,  # Could mask this if needed
@@ -1593,17 +1428,35 @@ async def get_public_quote(
             created_at=quote.created_at.isoformat() if quote.created_at else "",
         )
 
+        # Rate-limited opened event tracking (once per 10 minutes per token).
+        cache_key = f"opened_{token}"
+
+        if _opened_events_limiter.hit(cache_key):
+            # Buffered and inserted in batches by the flush thread
+            tasks.quote_event_buffer.add(
+                schemas.QuoteEventCreate(
+                    quote_id=quote.id,
+                    type="opened",
+                    meta=_event_meta(
+                        opened_at=datetime.utcnow().isoformat() + "Z"
+                    ),
+                ),
+                # A lost open must not suppress the retry for the whole window
+                on_drop=partial(_opened_events_limiter.discard, cache_key),
+            )
+
+        return public_quote
+
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Error getting public quote: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error getting public quote")
         raise HTTPException(status_code=500, detail="Failed to retrieve quote")
 
 
 # Update accept quote endpoint to handle package acceptance
 @app.post("/public/quotes/{token}/accept")
-async def accept_public_quote(
+def accept_public_quote(
     token: str,
     accept_request: schemas.QuotePackageAcceptRequest,
     db: Session = Depends(get_db),
@@ -1626,52 +1479,47 @@ async def accept_public_quote(
                 detail=f"Quote cannot be accepted in status '{quote.status}'. Only 'SENT' or 'REVIEWED' quotes can be accepted.",
             )
 
-        # Update quote to mark package as accepted
-        updated_quote = crud.update_quote_accepted_package(
-            db, quote.id, accept_request.packageId, quote.tenant_id
-        )
-        
-        if not updated_quote:
+        # The package must belong to this quote
+        package = db.query(QuotePackage).filter(
+            QuotePackage.id == accept_request.packageId,
+            QuotePackage.quote_id == quote.id,
+        ).first()
+        if not package:
             raise HTTPException(
                 status_code=400, detail="Invalid package ID or package not found"
             )
+        package_name = package.name
 
-        # Update quote status to ACCEPTED
+        # Accepted package, status and events are written in a single commit
+        previous_status = quote.status
+        quote.accepted_package_id = package.id
         quote.status = "ACCEPTED"
-        db.commit()
-        db.refresh(quote)
 
-        # Get package name for event logging
-        package_name = "Unknown"
-        try:
-            package = db.query(QuotePackage).filter(
-                QuotePackage.id == accept_request.packageId
-            ).first()
-            if package:
-                package_name = package.name
-        except Exception:
-            pass
+        # One timestamp shared by the accepted and option_finalized events
+        now_iso = datetime.utcnow().isoformat() + "Z"
 
-        # Create accepted event with package information
+        # Create accepted event with package information. Each event gets a
+        # savepoint so a failed insert doesn't roll back the acceptance.
         try:
-            event = crud.create_quote_event(
-                db,
-                schemas.QuoteEventCreate(
-                    quote_id=quote.id,
-                    type="accepted",
-                    meta={
-                        "ip": "unknown",  # Could extract from request if needed
-                        "user_agent": "unknown",  # Could extract from request if needed
-                        "accepted_at": datetime.now().isoformat(),
-                        "previous_status": quote.status,
-                        "package_id": str(accept_request.packageId),
-                        "package_name": package_name,
-                    },
-                ),
-            )
-            print(f"✅ Quote accepted event created: {event.id}")
+            with db.begin_nested():
+                event = crud.create_quote_event(
+                    db,
+                    schemas.QuoteEventCreate(
+                        quote_id=quote.id,
+                        type="accepted",
+                        meta=_event_meta(
+                            accepted_at=now_iso,
+                            previous_status=previous_status,
+                            package_id=str(accept_request.packageId),
+                            package_name=package_name,
+                        ),
+                    ),
+                    commit=False,
+                    company_id=quote.company_id,
+                )
+            logger.debug("✅ Quote accepted event created: %s", event.id)
         except Exception as e:
-            print(f"Warning: Could not create accepted event: {e}")
+            logger.warning("Could not create accepted event: %s", e)
             # Don't fail the request if event creation fails
         
         # Create option_finalized event with final selection
@@ -1698,66 +1546,70 @@ async def accept_public_quote(
                 total_subtotal = base_subtotal + optional_subtotal
                 
                 # Get VAT rate from quote profile
-                profile = db.query(PriceProfile).filter(
+                profile_vat_rate = db.query(PriceProfile.vat_rate).filter(
                     PriceProfile.id == quote.profile_id
-                ).first()
+                ).limit(1).scalar()
                 
-                vat_rate = float(profile.vat_rate) / 100.0 if profile else 0.25
+                vat_rate = float(profile_vat_rate) / 100.0 if profile_vat_rate is not None else 0.25
                 vat_amount = total_subtotal * Decimal(str(vat_rate))
                 total_amount = total_subtotal + vat_amount
                 
-                option_finalized_event = crud.create_quote_event(
-                    db,
-                    schemas.QuoteEventCreate(
-                        quote_id=quote.id,
-                        type="option_finalized",
-                        meta={
-                            "ip": "unknown",
-                            "user_agent": "unknown",
-                            "finalized_at": datetime.now().isoformat(),
-                            "package_id": str(accept_request.packageId),
-                            "package_name": package_name,
-                            "final_selected_item_ids": selected_item_ids,
-                            "final_selected_count": len(selected_item_ids),
-                            "total_optional_items": len(optional_items),
-                            "base_subtotal": float(base_subtotal),
-                            "optional_subtotal": float(optional_subtotal),
-                            "total_subtotal": float(total_subtotal),
-                            "vat_amount": float(vat_amount),
-                            "final_total": float(total_amount),
-                            "final_currency": quote.currency
-                        },
-                    ),
-                )
-                print(f"✅ Quote option finalized event created: {option_finalized_event.id}")
+                with db.begin_nested():
+                    option_finalized_event = crud.create_quote_event(
+                        db,
+                        schemas.QuoteEventCreate(
+                            quote_id=quote.id,
+                            type="option_finalized",
+                            meta=_event_meta(
+                                finalized_at=now_iso,
+                                package_id=str(accept_request.packageId),
+                                package_name=package_name,
+                                final_selected_item_ids=selected_item_ids,
+                                final_selected_count=len(selected_item_ids),
+                                total_optional_items=len(optional_items),
+                                base_subtotal=float(base_subtotal),
+                                optional_subtotal=float(optional_subtotal),
+                                total_subtotal=float(total_subtotal),
+                                vat_amount=float(vat_amount),
+                                final_total=float(total_amount),
+                                final_currency=quote.currency,
+                            ),
+                        ),
+                        commit=False,
+                        company_id=quote.company_id,
+                    )
+                logger.debug("✅ Quote option finalized event created: %s", option_finalized_event.id)
             else:
-                print("Warning: No quote items found for option_finalized event")
+                logger.warning("No quote items found for option_finalized event")
                 
         except Exception as e:
-            print(f"Warning: Could not create option_finalized event: {e}")
+            logger.warning("Could not create option_finalized event: %s", e)
             # Don't fail the request if event creation fails
 
-        print(f"🎉 Quote {quote.id} accepted with package {package_name}! Status: {quote.status}")
+        quote_id = quote.id
+        db.commit()
+        crud.invalidate_public_token(token)
+
+        logger.info("🎉 Quote %s accepted with package %s! Status: ACCEPTED", quote_id, package_name)
 
         return {
             "message": f"Quote accepted successfully with package: {package_name}",
             "status": "ACCEPTED",
-            "quote_id": str(quote.id),
+            "quote_id": str(quote_id),
             "package_id": str(accept_request.packageId),
             "package_name": package_name,
         }
 
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Error accepting quote: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error accepting quote")
         raise HTTPException(status_code=500, detail="Failed to accept quote")
 
 
 # Get options history for a quote (internal view)
 @app.get("/quotes/{quote_id}/options-history", response_model=List[schemas.QuoteEventOut])
-async def get_quote_options_history(
+def get_quote_options_history(
     quote_id: str,
     current_user: User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
@@ -1800,8 +1652,7 @@ async def get_quote_options_history(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting options history: {e}")
-        traceback.print_exc()
+        logger.exception("Error getting options history")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get options history: {str(e)}"
@@ -1810,7 +1661,7 @@ async def get_quote_options_history(
 
 # Decline quote endpoint (no authentication required)
 @app.post("/public/quotes/{token}/decline")
-async def decline_public_quote(
+def decline_public_quote(
     token: str,
     db: Session = Depends(get_db),
 ):
@@ -1832,270 +1683,89 @@ async def decline_public_quote(
                 detail=f"Quote cannot be declined in status '{quote.status}'. Only 'SENT' or 'REVIEWED' quotes can be declined.",
             )
 
-        # Update quote status to DECLINED
+        # Status change and event are written in a single commit
+        quote_id = quote.id
+        previous_status = quote.status
         quote.status = "DECLINED"
-        db.commit()
-        db.refresh(quote)
 
-        # Create declined event
+        # Create declined event. The savepoint keeps a failed insert from
+        # rolling back the status change.
         try:
-            event = crud.create_quote_event(
-                db,
-                schemas.QuoteEventCreate(
-                    quote_id=quote.id,
-                    type="declined",
-                    meta={
-                        "ip": "unknown",  # Could extract from request if needed
-                        "user_agent": "unknown",  # Could extract from request if needed
-                        "declined_at": datetime.now().isoformat(),
-                        "previous_status": quote.status,
-                    },
-                ),
-            )
-            print(f"❌ Quote declined event created: {event.id}")
+            with db.begin_nested():
+                event = crud.create_quote_event(
+                    db,
+                    schemas.QuoteEventCreate(
+                        quote_id=quote_id,
+                        type="declined",
+                        meta=_event_meta(
+                            declined_at=datetime.utcnow().isoformat() + "Z",
+                            previous_status=previous_status,
+                        ),
+                    ),
+                    commit=False,
+                    company_id=quote.company_id,
+                )
+            logger.debug("❌ Quote declined event created: %s", event.id)
         except Exception as e:
-            print(f"Warning: Could not create declined event: {e}")
+            logger.warning("Could not create declined event: %s", e)
             # Don't fail the request if event creation fails
 
-        print(f"💔 Quote {quote.id} declined! Status: {quote.status}")
+        db.commit()
+        crud.invalidate_public_token(token)
+
+        logger.info("💔 Quote %s declined! Status: DECLINED", quote_id)
 
         return {
             "message": "Quote declined successfully",
             "status": "DECLINED",
-            "quote_id": str(quote.id),
+            "quote_id": str(quote_id),
         }
 
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Error declining quote: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error declining quote")
         raise HTTPException(status_code=500, detail="Failed to decline quote")
 
 
 # Tracking pixel endpoint for email open tracking
 @app.get("/public/pixel/{token}.png")
-async def tracking_pixel(
+def tracking_pixel(
     token: str,
     db: Session = Depends(get_db),
 ):
     """Tracking pixel endpoint for email open tracking (no authentication required)."""
     try:
-        # Get quote by public token
-        quote = crud.get_quote_by_public_token(db, token)
+        # Only the quote ID is needed; repeated hits are served from cache
+        quote = crud.get_quote_ref_by_public_token(db, token)
         if not quote:
             # Return 1x1 transparent PNG even if quote not found (for security)
             # This prevents attackers from determining valid tokens
             pass
         else:
             # Rate-limited opened event tracking (once per 10 minutes per token)
-            current_time = time.time()
             cache_key = f"opened_{token}"
 
-            if (
-                cache_key not in _opened_events_cache
-                or current_time - _opened_events_cache[cache_key] > 600
-            ):  # 10 minutes = 600 seconds
-
-                # Create opened event
-                try:
-                    event = crud.create_quote_event(
-                        db,
-                        schemas.QuoteEventCreate(
-                            quote_id=quote.id,
-                            type="opened",
-                            meta={
-                                "ip": "unknown",  # Could extract from request if needed
-                                "user_agent": "unknown",  # Could extract from request if needed
-                                "opened_at": datetime.now().isoformat(),
-                                "source": "tracking_pixel",
-                            },
+            if _opened_events_limiter.hit(cache_key):
+                # Buffered and inserted in batches by the flush thread
+                tasks.quote_event_buffer.add(
+                    schemas.QuoteEventCreate(
+                        quote_id=quote.id,
+                        type="opened",
+                        meta=_event_meta(
+                            opened_at=datetime.utcnow().isoformat() + "Z",
+                            source="tracking_pixel",
                         ),
-                    )
-                    print(f"📖 Quote opened event created via pixel: {event.id}")
-
-                    # Update cache
-                    _opened_events_cache[cache_key] = current_time
-
-                except Exception as e:
-                    print(f"Warning: Could not create opened event via pixel: {e}")
-                    # Don't fail the request if event creation fails
-
-        # Create 1x1 transparent PNG in memory
-        # This is a minimal PNG file with transparency
-        png_data = bytes(
-            [
-                0x89,
-                0x50,
-                0x4E,
-                0x47,
-                0x0D,
-                0x0A,
-                0x1A,
-                0x0A,  # PNG signature
-                0x00,
-                0x00,
-                0x00,
-                0x0D,
-                0x49,
-                0x48,
-                0x44,
-                0x52,  # IHDR chunk
-                0x00,
-                0x00,
-                0x00,
-                0x01,
-                0x00,
-                0x00,
-                0x00,
-                0x01,  # 1x1 dimensions
-                0x08,
-                0x02,
-                0x00,
-                0x00,
-                0x00,
-                0x90,
-                0x77,
-                0x53,  # Color type, compression, filter, interlace
-                0xDE,
-                0x00,
-                0x00,
-                0x00,
-                0x0C,
-                0x49,
-                0x44,
-                0x41,  # IDAT chunk
-                0x54,
-                0x08,
-                0x99,
-                0x01,
-                0x01,
-                0x00,
-                0x00,
-                0x00,  # Compressed data (1 transparent pixel)
-                0xFF,
-                0xFF,
-                0x00,
-                0x00,
-                0x00,
-                0x02,
-                0x00,
-                0x01,  # End of compressed data
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x49,
-                0x45,
-                0x4E,
-                0x44,  # IEND chunk
-                0xAE,
-                0x42,
-                0x60,
-                0x82,  # IEND signature
-            ]
-        )
-
-        from fastapi.responses import Response
+                    ),
+                    on_drop=partial(_opened_events_limiter.discard, cache_key),
+                )
 
-        return Response(
-            content=png_data,
-            media_type="image/png",
-            headers={
-                "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0",
-            },
-        )
+        return Response(content=_TRACKING_PIXEL_PNG, **_PIXEL_RESPONSE_KW)
 
-    except Exception as e:
-        print(f"Error in tracking pixel: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error in tracking pixel")
         # Return 1x1 transparent PNG even on error (for security)
-        png_data = bytes(
-            [
-                0x89,
-                0x50,
-                0x4E,
-                0x47,
-                0x0D,
-                0x0A,
-                0x1A,
-                0x0A,
-                0x00,
-                0x00,
-                0x00,
-                0x0D,
-                0x49,
-                0x48,
-                0x44,
-                0x52,
-                0x00,
-                0x00,
-                0x00,
-                0x01,
-                0x00,
-                0x00,
-                0x00,
-                0x01,
-                0x08,
-                0x02,
-                0x00,
-                0x00,
-                0x00,
-                0x90,
-                0x77,
-                0x53,
-                0xDE,
-                0x00,
-                0x00,
-                0x00,
-                0x0C,
-                0x49,
-                0x44,
-                0x41,
-                0x54,
-                0x08,
-                0x99,
-                0x01,
-                0x01,
-                0x00,
-                0x00,
-                0x00,
-                0xFF,
-                0xFF,
-                0x00,
-                0x00,
-                0x00,
-                0x02,
-                0x00,
-                0x01,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x49,
-                0x45,
-                0x4E,
-                0x44,
-                0xAE,
-                0x42,
-                0x60,
-                0x82,
-            ]
-        )
-
-        from fastapi.responses import Response
-
-        return Response(
-            content=png_data,
-            media_type="image/png",
-            headers={
-                "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0",
-            },
-        )
+        return Response(content=_TRACKING_PIXEL_PNG, **_PIXEL_RESPONSE_KW)
 
 
 # Helper function to compare and log quantity changes
@@ -2123,36 +1793,40 @@ def log_quantity_changes(
     if not source_items:
         return  # No source items to compare against
 
-    # Create tuning helper if we have room_type and finish_level
-    tuning_helper = None
-    if room_type and finish_level:
-        try:
-            from .tuning import create_tuning_helper
-            tuning_helper = create_tuning_helper(db, company_id)
-        except ImportError:
-            print("Warning: Tuning helper not available, falling back to basic logging")
-            tuning_helper = None
-
-    # Create a lookup dictionary for source items by ref
+    # Index the original raw quantities by ref in a single pass
     source_lookup = {}
     for item in source_items:
-        ref = item.get("ref") or item.get("description", "")
+        ref = item.get("ref") or item.get("description")
         if ref:
-            source_lookup[ref] = item
+            source_lookup[ref] = item.get("qty", 0)
 
-    # Compare each final item with its source
+    # Compare each final item with its source, collecting the changes
+    adjustments = []
     for final_item in final_items:
-        ref = final_item.get("ref") or final_item.get("description", "")
+        ref = final_item.get("ref") or final_item.get("description")
         if not ref:
             continue
 
-        source_item = source_lookup.get(ref)
-        if not source_item:
+        old_raw = source_lookup.get(ref)
+        if old_raw is None:
+            continue
+
+        # Fast path: most items are unchanged, so compare the raw values
+        # (and a cheap float ratio just below the 1% threshold) before
+        # paying for Decimal parsing. Borderline cases fall through to the
+        # exact Decimal comparison below.
+        new_raw = final_item.get("qty", 0)
+        if old_raw == new_raw:
+            continue
+        old_float = float(old_raw or 0)
+        if old_float <= 0:
+            continue
+        if abs(float(new_raw or 0) - old_float) / old_float < 0.0099:
             continue
 
         # Compare quantities with 1% threshold
-        old_qty = Decimal(str(source_item.get("qty", 0)))
-        new_qty = Decimal(str(final_item.get("qty", 0)))
+        old_qty = Decimal(str(old_raw))
+        new_qty = Decimal(str(new_raw))
         
         # Calculate percentage difference
         if old_qty > 0:
@@ -2160,55 +1834,43 @@ def log_quantity_changes(
             threshold = Decimal('0.01')  # 1%
             
             if percentage_diff >= threshold:
-                if tuning_helper and room_type and finish_level:
-                    # Use advanced tuning helper
-                    try:
-                        tuning_helper.log_adjustment_and_update_tuning(
-                            quote_id=quote_id,
-                            item_ref=ref,
-                            old_qty=old_qty,
-                            new_qty=new_qty,
-                            room_type=room_type,
-                            finish_level=finish_level,
-                            adjustment_reason=f"User adjusted quantity from {old_qty} to {new_qty} (diff: {percentage_diff:.1%})"
-                        )
-                    except Exception as e:
-                        print(f"Error in tuning helper: {e}")
-                        # Fall back to basic logging
-                        _log_basic_adjustment(db, quote_id, ref, old_qty, new_qty)
-                else:
-                    # Use basic logging
-                    _log_basic_adjustment(db, quote_id, ref, old_qty, new_qty)
+                adjustments.append(
+                    {
+                        "quote_id": quote_id,
+                        "item_ref": ref,
+                        "old_qty": old_qty,
+                        "new_qty": new_qty,
+                        "reason": f"User adjusted quantity from {old_qty} to {new_qty} (diff: {percentage_diff:.1%})",
+                    }
+                )
 
+    if not adjustments:
+        return
 
-def _log_basic_adjustment(
-    db: Session,
-    quote_id: UUID,
-    item_ref: str,
-    old_qty: Decimal,
-    new_qty: Decimal,
-) -> None:
-    """Basic adjustment logging without tuning integration."""
+    # Log all changes with a single INSERT
     try:
-        crud.create_quote_adjustment_log(
-            db,
-            schemas.QuoteAdjustmentLogCreate(
-                quote_id=quote_id,
-                item_ref=item_ref,
-                old_qty=old_qty,
-                new_qty=new_qty,
-                reason=f"User adjusted quantity from {old_qty} to {new_qty}",
-            ),
-        )
+        crud.create_quote_adjustment_logs(db, company_id, adjustments)
     except Exception as e:
-        print(f"Error logging basic adjustment: {e}")
+        db.rollback()
+        logger.error("Error logging adjustments: %s", e)
+        return
+
+    # Update tuning statistics if we have room_type and finish_level
+    if room_type and finish_level:
+        try:
+            create_tuning_helper(db, company_id).update_tuning_for_adjustments(
+                room_type, finish_level, adjustments
+            )
+        except Exception as e:
+            logger.error("Error in tuning helper: %s", e)
 
 
 @app.post("/quotes/{quote_id}/adjustments", response_model=schemas.QuoteAdjustmentOut)
-async def log_quote_adjustment(
+def log_quote_adjustment(
     quote_id: str,
     adjustment: schemas.QuoteAdjustmentIn,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2235,22 +1897,13 @@ async def log_quote_adjustment(
          }'
     ```
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Verify quote belongs to user's company
-    quote = db.query(Quote).filter(
+    owned_quote_id = db.query(Quote.id).filter(
         Quote.id == uuid.UUID(quote_id),
         Quote.company_id == company_id
-    ).first()
+    ).limit(1).scalar()
     
-    if not quote:
+    if not owned_quote_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Quote not found"
         )
@@ -2286,8 +1939,9 @@ async def log_quote_adjustment(
 
 
 @app.get("/auto-tuning/insights", response_model=schemas.AutoTuningInsightsResponse)
-async def get_auto_tuning_insights(
+def get_auto_tuning_insights(
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2311,15 +1965,6 @@ async def get_auto_tuning_insights(
     - Human-readable interpretations of adjustments
     - Suggestions for improving system accuracy
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Get auto-tuning insights
     tuning_engine = create_auto_tuning_engine(db, company_id)
     insights = tuning_engine.get_tuning_insights()
@@ -2374,8 +2019,9 @@ async def get_auto_tuning_insights(
 # ============================================================================
 
 @app.get("/admin/rules", response_model=List[schemas.GenerationRuleOut])
-async def get_generation_rules(
+def get_generation_rules(
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2389,25 +2035,17 @@ async def get_generation_rules(
          -H "Authorization: Bearer <token>"
     ```
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Get generation rules for the company
     rules = crud.get_generation_rules_by_company(db, company_id)
     return rules
 
 
 @app.put("/admin/rules/{rule_id}", response_model=schemas.GenerationRuleOut)
-async def update_generation_rule(
+def update_generation_rule(
     rule_id: str,
     rule_update: schemas.GenerationRuleUpdate,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2428,15 +2066,6 @@ async def update_generation_rule(
          }'
     ```
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Get the rule and verify ownership
     rule = crud.get_generation_rule_by_id(db, rule_id)
     if not rule or rule.company_id != company_id:
@@ -2450,9 +2079,10 @@ async def update_generation_rule(
 
 
 @app.post("/admin/rules/test", response_model=schemas.RuleTestResponse)
-async def test_generation_rule(
+def test_generation_rule(
     test_request: schemas.RuleTestRequest,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2483,15 +2113,6 @@ async def test_generation_rule(
     - Calculated totals (subtotal, VAT, total)
     - No data is saved to the database
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Get the generation rule
     rule = crud.get_generation_rule_by_key(db, company_id, test_request.key)
     if not rule:
@@ -2506,14 +2127,23 @@ async def test_generation_rule(
         
         # Generate items based on the rule
         generated_items = []
+        labor_items, material_items = get_rule_items(rule)
+
+        # Fetch all referenced prices up front, one query per table
+        labor_rates = crud.get_labor_rates_by_codes(
+            db, company_id, [ref for ref, _ in labor_items]
+        )
+        materials = crud.get_materials_by_skus(
+            db, company_id, [ref for ref, _ in material_items]
+        )
         
         # Process labor items
-        if "labor" in rule.rules:
-            for ref, expression in rule.rules["labor"].items():
+        if labor_items:
+            for ref, expression in labor_items:
                 try:
                     qty = evaluator.evaluate(expression)
                     # Get labor rate for this item
-                    labor_rate = crud.get_labor_rate_by_code(db, company_id, ref)
+                    labor_rate = labor_rates.get(ref)
                     if labor_rate:
                         unit_price = float(labor_rate.unit_price)
                         line_total = float(qty) * unit_price
@@ -2529,16 +2159,16 @@ async def test_generation_rule(
                         })
                 except ValueError as e:
                     # Skip items with invalid expressions
-                    print(f"Warning: Invalid expression '{expression}' for {ref}: {e}")
+                    logger.warning("Invalid expression '%s' for %s: %s", expression, ref, e)
                     continue
         
         # Process material items
-        if "materials" in rule.rules:
-            for ref, expression in rule.rules["materials"].items():
+        if material_items:
+            for ref, expression in material_items:
                 try:
                     qty = evaluator.evaluate(expression)
                     # Get material for this item
-                    material = crud.get_material_by_code(db, company_id, ref)
+                    material = materials.get(ref)
                     if material:
                         # Calculate unit price with markup
                         unit_cost = float(material.unit_cost)
@@ -2550,7 +2180,7 @@ async def test_generation_rule(
                         generated_items.append({
                             "kind": "material",
                             "ref": ref,
-                            "description": material.description or f"Material {ref}",
+                            "description": material.name or f"Material {ref}",
                             "qty": float(qty),
                             "unit": material.unit or "st",
                             "unit_price": unit_price,
@@ -2558,7 +2188,7 @@ async def test_generation_rule(
                         })
                 except ValueError as e:
                     # Skip items with invalid expressions
-                    print(f"Warning: Invalid expression '{expression}' for {ref}: {e}")
+                    logger.warning("Invalid expression '%s' for %s: %s", expression, ref, e)
                     continue
         
         if not generated_items:
@@ -2592,9 +2222,10 @@ async def test_generation_rule(
 # ============================================================================
 
 @app.get("/quotes/{quote_id}/options", response_model=schemas.QuoteOptionGroupsResponse)
-async def get_quote_option_groups(
+def get_quote_option_groups(
     quote_id: str,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2613,15 +2244,6 @@ async def get_quote_option_groups(
     - current_total: Current quote total with selected options
     - base_total: Base quote total without optional items
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     # Get option groups for the quote
     option_groups = crud.get_quote_option_groups(db, uuid.UUID(quote_id), company_id)
     
@@ -2649,10 +2271,11 @@ async def get_quote_option_groups(
 
 
 @app.post("/quotes/{quote_id}/options", response_model=schemas.UpdateQuoteOptionsResponse)
-async def update_quote_options(
+def update_quote_options(
     quote_id: str,
     update_request: schemas.UpdateQuoteOptionsRequest,
     current_user: User = Depends(auth.get_current_active_user),
+    company_id: UUID = Depends(auth.get_current_company_id),
     db: Session = Depends(get_db),
 ):
     """
@@ -2677,31 +2300,30 @@ async def update_quote_options(
     - message: Status message
     - updated_items: Updated items with selection status
     """
-    # Get companies for the user
-    companies = crud.get_companies_by_tenant(db, current_user.tenant_id)
-    if not companies:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No company found for user"
-        )
-    
-    company_id = companies[0].id
-    
     try:
+        # Parse IDs once and reuse them for the update and the item lookup
+        quote_uuid = uuid.UUID(quote_id)
+        selected_uuids = [uuid.UUID(item_id) for item_id in update_request.selected_items]
+
         # Update quote options
         result = crud.update_quote_options(
             db, 
-            uuid.UUID(quote_id), 
+            quote_uuid, 
             company_id, 
-            [uuid.UUID(item_id) for item_id in update_request.selected_items]
+            selected_uuids
         )
         
-        # Get updated items for response
+        # Get updated items for response in a single IN query
+        items_by_id = {
+            item.id: item
+            for item in db.query(QuoteItem).filter(
+                QuoteItem.id.in_(selected_uuids),
+                QuoteItem.quote_id == quote_uuid
+            )
+        } if selected_uuids else {}
         updated_items = []
-        for item_id in update_request.selected_items:
-            item = db.query(models.QuoteItem).filter(
-                models.QuoteItem.id == uuid.UUID(item_id),
-                models.QuoteItem.quote_id == uuid.UUID(quote_id)
-            ).first()
+        for item_id in selected_uuids:
+            item = items_by_id.get(item_id)
             
             if item:
                 updated_items.append(schemas.OptionGroupItem(
@@ -2736,11 +2358,23 @@ async def update_quote_options(
         )
 
 
+def _parse_uuid_set(values) -> set:
+    """Parse ID strings into a set of UUIDs, ignoring malformed values."""
+    parsed = set()
+    for value in values:
+        try:
+            parsed.add(uuid.UUID(value))
+        except (ValueError, TypeError, AttributeError):
+            continue
+    return parsed
+
+
 # Update quote selection endpoint (no authentication required)
-@app.post("/public/quotes/{token}/update-selection")
-async def update_public_quote_selection(
+@app.post("/public/quotes/{token}/update-selection", response_class=ORJSONResponse)
+def update_public_quote_selection(
     token: str,
     selection_request: schemas.PublicQuoteSelectionUpdateRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     """
@@ -2766,7 +2400,7 @@ async def update_public_quote_selection(
     """
     try:
         # Get quote by public token
-        quote = crud.get_quote_by_public_token(db, token)
+        quote = crud.get_quote_with_items_by_public_token(db, token)
         if not quote:
             raise HTTPException(status_code=404, detail="Quote not found")
         
@@ -2777,18 +2411,18 @@ async def update_public_quote_selection(
                 detail=f"Quote cannot be updated in status '{quote.status}'. Only 'SENT' or 'REVIEWED' quotes can be updated."
             )
         
-        # Get all quote items
-        quote_items = db.query(QuoteItem).filter(
-            QuoteItem.quote_id == quote.id
-        ).all()
+        # Items and profile are eager-loaded with the quote
+        quote_items = quote.items
         
         if not quote_items:
             raise HTTPException(
                 status_code=404, detail="No items found for this quote"
             )
         
-        # Create a set of selected item IDs for fast lookup
+        # Create sets of selected item IDs for fast lookup; the UUID set lets
+        # us compare against item.id without str() per item
         selected_ids = set(selection_request.selectedItemIds)
+        selected_uuids = _parse_uuid_set(selected_ids)
         
         # Mark items as selected and calculate totals
         base_subtotal = Decimal('0')
@@ -2797,7 +2431,7 @@ async def update_public_quote_selection(
         
         for item in quote_items:
             # Mark isSelected based on whether item ID is in selectedItemIds
-            is_selected = str(item.id) in selected_ids
+            is_selected = item.id in selected_uuids
             
             # Calculate line total for this item
             if item.is_optional:
@@ -2814,14 +2448,14 @@ async def update_public_quote_selection(
             
             # Create item response with selection status
             item_response = {
-                "id": str(item.id),
+                "id": item.id,
                 "kind": item.kind,
                 "ref": item.ref,
                 "description": item.description,
                 "qty": item.qty,
                 "unit": item.unit,
                 "unit_price": item.unit_price,
-                "line_total": float(line_total),
+                "line_total": line_total,
                 "is_optional": item.is_optional,
                 "option_group": item.option_group,
                 "isSelected": is_selected
@@ -2832,11 +2466,7 @@ async def update_public_quote_selection(
         new_subtotal = base_subtotal + optional_subtotal
         
         # Get VAT rate from quote profile
-        profile = db.query(PriceProfile).filter(
-            PriceProfile.id == quote.profile_id
-        ).first()
-        
-        vat_rate = float(profile.vat_rate) / 100.0 if profile else 0.25
+        vat_rate = float(quote.profile.vat_rate) / 100.0 if quote.profile else 0.25
         new_vat = new_subtotal * Decimal(str(vat_rate))
         new_total = new_subtotal + new_vat
         
@@ -2857,58 +2487,56 @@ async def update_public_quote_selection(
             if previous_event and "selected_item_ids" in previous_event.meta:
                 previous_selected_ids = set(previous_event.meta["selected_item_ids"])
             
-            current_selected_ids = set(selected_ids)
-            added_items = list(current_selected_ids - previous_selected_ids)
-            removed_items = list(previous_selected_ids - current_selected_ids)
+            added_items = list(selected_ids - previous_selected_ids)
+            removed_items = list(previous_selected_ids - selected_ids)
             
-            event_meta = {
-                "ip": "unknown",  # Could extract from request if needed
-                "user_agent": "unknown",  # Could extract from request if needed
-                "updated_at": datetime.now().isoformat(),
-                "selected_item_count": len(selected_ids),
-                "total_items": len(quote_items),
-                "previous_total": float(previous_total),
-                "new_total": float(new_total),
-                "total_difference": float(total_difference),
-                "selected_item_ids": list(selected_ids),
-                "base_subtotal": float(base_subtotal),
-                "optional_subtotal": float(optional_subtotal),
-                "added": added_items,
-                "removed": removed_items,
-                "previous_selected_count": len(previous_selected_ids)
-            }
+            event_meta = _event_meta(
+                updated_at=datetime.utcnow().isoformat() + "Z",
+                selected_item_count=len(selected_ids),
+                total_items=len(quote_items),
+                previous_total=float(previous_total),
+                new_total=float(new_total),
+                total_difference=float(total_difference),
+                selected_item_ids=list(selected_ids),
+                base_subtotal=float(base_subtotal),
+                optional_subtotal=float(optional_subtotal),
+                added=added_items,
+                removed=removed_items,
+                previous_selected_count=len(previous_selected_ids),
+            )
             
-            event = crud.create_quote_event(
-                db,
+            # Insert the event after the response has been sent
+            background_tasks.add_task(
+                tasks.record_quote_event,
                 schemas.QuoteEventCreate(
                     quote_id=quote.id,
                     type="option_updated",
                     meta=event_meta
-                )
+                ),
             )
-            print(f"✅ Quote selection update event created: {event.id}")
         except Exception as e:
-            print(f"Warning: Could not create selection update event: {e}")
+            logger.warning("Could not create selection update event: %s", e)
             # Don't fail the request if event creation fails
         
-        print(f"🔄 Quote {quote.id} selection updated! New total: {new_total:.2f} SEK (was: {previous_total:.2f} SEK)")
+        logger.info("🔄 Quote %s selection updated! New total: %.2f SEK (was: %.2f SEK)", quote.id, new_total, previous_total)
         
-        return {
+        # Return the response directly so orjson serializes Decimals/UUIDs
+        # without a jsonable_encoder pass
+        return ORJSONResponse({
             "items": updated_items,
-            "subtotal": float(new_subtotal),
-            "vat": float(new_vat),
-            "total": float(new_total),
-            "base_subtotal": float(base_subtotal),
-            "optional_subtotal": float(optional_subtotal),
+            "subtotal": new_subtotal,
+            "vat": new_vat,
+            "total": new_total,
+            "base_subtotal": base_subtotal,
+            "optional_subtotal": optional_subtotal,
             "selected_item_count": len(selected_ids),
             "message": f"Quote selection updated successfully. New total: {new_total:.2f} SEK"
-        }
+        })
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Error updating quote selection: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error updating quote selection")
         raise HTTPException(status_code=500, detail="Failed to update quote selection")
 
 
@@ -1,6 +1,8 @@
+import os
+import time
 import uuid
 
-from sqlalchemy import Column, String, Numeric, TIMESTAMP, text, ForeignKey, Boolean, Text, Integer
+from sqlalchemy import Column, String, Numeric, TIMESTAMP, text, ForeignKey, Boolean, Text, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import sqlalchemy as sa
@@ -8,22 +10,40 @@ import sqlalchemy as sa
 from .db import Base
 
 
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits are the Unix time in milliseconds, so new primary keys
+    land at the right-hand edge of the btree index instead of at random
+    pages. The remaining bits are random.
+    """
+    value = (time.time_ns() // 1_000_000) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    # Set version 7 and the RFC 4122 variant
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
 class Tenant(Base):
     __tablename__ = "tenant"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     name = Column(String, nullable=False, unique=True)
     domain = Column(String, unique=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
 
-    # Relationships
-    users = relationship("User", back_populates="tenant")
-    companies = relationship("Company", back_populates="tenant")
+    # Relationships. Owner-side collections (all of a tenant's users, all of a
+    # company's quotes, ...) are unbounded, so they raise on lazy access;
+    # query them directly or opt in with selectinload().
+    users = relationship("User", back_populates="tenant", lazy="raise")
+    companies = relationship("Company", back_populates="tenant", lazy="raise")
 
 
 class User(Base):
     __tablename__ = "user"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenant.id"), nullable=False)
     email = Column(String, nullable=False, unique=True)
     username = Column(String, nullable=False, unique=True)
@@ -35,30 +55,30 @@ class User(Base):
 
     # Relationships
     tenant = relationship("Tenant", back_populates="users")
-    quotes = relationship("Quote", back_populates="user")
+    quotes = relationship("Quote", back_populates="user", lazy="raise")
 
 
 class Company(Base):
     __tablename__ = "company"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenant.id"), nullable=False)
     name = Column(String, nullable=False)
 
     # Relationships
     tenant = relationship("Tenant", back_populates="companies")
-    price_profiles = relationship("PriceProfile", back_populates="company")
-    labor_rates = relationship("LaborRate", back_populates="company")
-    materials = relationship("Material", back_populates="company")
-    quotes = relationship("Quote", back_populates="company")
-    project_requirements = relationship("ProjectRequirements", back_populates="company")
-    generation_rules = relationship("GenerationRule", back_populates="company")
-    quote_adjustment_logs = relationship("QuoteAdjustmentLog", back_populates="company")
-    tuning_stats = relationship("TuningStat", back_populates="company")
+    price_profiles = relationship("PriceProfile", back_populates="company", lazy="raise")
+    labor_rates = relationship("LaborRate", back_populates="company", lazy="raise")
+    materials = relationship("Material", back_populates="company", lazy="raise")
+    quotes = relationship("Quote", back_populates="company", lazy="raise")
+    project_requirements = relationship("ProjectRequirements", back_populates="company", lazy="raise")
+    generation_rules = relationship("GenerationRule", back_populates="company", lazy="raise")
+    quote_adjustment_logs = relationship("QuoteAdjustmentLog", back_populates="company", lazy="raise")
+    tuning_stats = relationship("TuningStat", back_populates="company", lazy="raise")
 
 
 class PriceProfile(Base):
     __tablename__ = "price_profile"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     name = Column(String, nullable=False)
     currency = Column(String, nullable=False, default="SEK")
@@ -66,14 +86,14 @@ class PriceProfile(Base):
 
     # Relationships
     company = relationship("Company", back_populates="price_profiles")
-    labor_rates = relationship("LaborRate", back_populates="profile")
-    materials = relationship("Material", back_populates="profile")
-    quotes = relationship("Quote", back_populates="profile")
+    labor_rates = relationship("LaborRate", back_populates="profile", lazy="raise")
+    materials = relationship("Material", back_populates="profile", lazy="raise")
+    quotes = relationship("Quote", back_populates="profile", lazy="raise")
 
 
 class LaborRate(Base):
     __tablename__ = "labor_rate"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     profile_id = Column(UUID(as_uuid=True), ForeignKey("price_profile.id"))
     code = Column(String, nullable=False)
@@ -88,7 +108,7 @@ class LaborRate(Base):
 
 class Material(Base):
     __tablename__ = "material"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     profile_id = Column(UUID(as_uuid=True), ForeignKey("price_profile.id"))
     sku = Column(String)
@@ -105,7 +125,12 @@ class Material(Base):
 
 class Quote(Base):
     __tablename__ = "quote"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        # Quote lists filter on tenant and sort newest first; stats scope by company
+        Index("ix_quote_tenant_created", "tenant_id", "created_at"),
+        Index("ix_quote_company_id", "company_id"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenant.id"), nullable=False)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), nullable=False)
@@ -131,28 +156,35 @@ class Quote(Base):
     company = relationship("Company", back_populates="quotes")
     user = relationship("User", back_populates="quotes")
     profile = relationship("PriceProfile", back_populates="quotes")
+    # Child collections raise instead of lazy loading, so a quote list can't
+    # silently turn into one query per row; load them with selectinload()
     items = relationship(
-        "QuoteItem", back_populates="quote", cascade="all, delete-orphan"
+        "QuoteItem", back_populates="quote", cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
     packages = relationship(
         "QuotePackage",
         foreign_keys="[QuotePackage.quote_id]",
         back_populates="quote",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
     accepted_package = relationship("QuotePackage", foreign_keys=[accepted_package_id], post_update=True)
     project_requirements = relationship("ProjectRequirements", back_populates="quote")
     adjustment_logs = relationship(
-        "QuoteAdjustmentLog", back_populates="quote", cascade="all, delete-orphan"
+        "QuoteAdjustmentLog", back_populates="quote", cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
     events = relationship(
-        "QuoteEvent", back_populates="quote", cascade="all, delete-orphan"
+        "QuoteEvent", back_populates="quote", cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
 
 
 class QuoteItem(Base):
     __tablename__ = "quote_item"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (Index("ix_quote_item_quote_id", "quote_id"),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quote_id = Column(
         UUID(as_uuid=True), ForeignKey("quote.id", ondelete="CASCADE"), nullable=False
     )
@@ -181,7 +213,7 @@ class QuotePackage(Base):
     """
 
     __tablename__ = "quote_package"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quote_id = Column(UUID(as_uuid=True), ForeignKey("quote.id", ondelete="CASCADE"), nullable=False)
     name = Column(Text, nullable=False)  # e.g., "Basic", "Standard", "Premium"
     items = Column(JSONB, nullable=False)  # List of package items
@@ -204,7 +236,7 @@ class QuoteEvent(Base):
     """
 
     __tablename__ = "quote_event"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quote_id = Column(UUID(as_uuid=True), ForeignKey("quote.id", ondelete="CASCADE"), nullable=False)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     event_type = Column(String, nullable=False)  # sent, opened, accepted, declined
@@ -226,7 +258,10 @@ class ProjectRequirements(Base):
     """
 
     __tablename__ = "project_requirements"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        Index("ix_project_requirements_company_quote", "company_id", "quote_id"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quote_id = Column(UUID(as_uuid=True), ForeignKey("quote.id", ondelete="CASCADE"), nullable=False)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
     data = Column(JSONB, nullable=False)  # Room type, area, finish level, etc.
@@ -248,11 +283,15 @@ class GenerationRule(Base):
     """
 
     __tablename__ = "generation_rule"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        Index("ix_generation_rule_company_key", "company_id", "key", unique=True),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id", ondelete="CASCADE"), nullable=False)
     key = Column(Text, nullable=False)  # Format: "roomType|finishLevel"
     rules = Column(JSONB, nullable=False)  # Generation rules configuration
     created_at = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=text("now()"), onupdate=sa.func.now())
 
     # Relationships
     company = relationship("Company", back_populates="generation_rules")
@@ -260,7 +299,11 @@ class GenerationRule(Base):
 
 class QuoteAdjustmentLog(Base):
     __tablename__ = "quote_adjustment_log"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        Index("ix_quote_adjustment_log_quote_created", "quote_id", "created_at"),
+        Index("ix_quote_adjustment_log_company_created", "company_id", "created_at"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quote_id = Column(UUID(as_uuid=True), ForeignKey("quote.id", ondelete="CASCADE"), nullable=False)
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id", ondelete="CASCADE"), nullable=False)
     item_ref = Column(Text, nullable=False)
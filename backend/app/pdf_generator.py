@@ -5,23 +5,137 @@ Generates PDFs that match exactly what the customer selected in the public view.
 Only includes mandatory items + selected optional items.
 """
 
+import logging
+import multiprocessing
 import os
-import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 try:
     from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
     WEASYPRINT_AVAILABLE = True
-except ImportError:
+except (ImportError, OSError):
+    # OSError: the Python package is installed but Pango/Cairo system
+    # libraries are missing
     WEASYPRINT_AVAILABLE = False
-    print("Warning: WeasyPrint not available. PDF generation will be disabled.")
+    logger.warning("WeasyPrint not available. PDF generation will be disabled.")
 
 from .models import Quote, QuoteItem, Company, PriceProfile
 from .schemas import PublicQuoteSelectionResponse
 
 
+# Stylesheet for quote PDFs. Kept out of the per-quote HTML so WeasyPrint
+# parses it once per process instead of on every render.
+QUOTE_STYLESHEET = """
+body {
+    font-family: 'Arial', sans-serif;
+    margin: 0;
+    padding: 20px;
+    color: #333;
+    line-height: 1.6;
+}
+.header {
+    text-align: center;
+    border-bottom: 3px solid #2563eb;
+    padding-bottom: 20px;
+    margin-bottom: 30px;
+}
+.company-info {
+    margin-bottom: 20px;
+}
+.quote-details {
+    background-color: #f8fafc;
+    padding: 20px;
+    border-radius: 8px;
+    margin-bottom: 30px;
+}
+.items-section {
+    margin-bottom: 30px;
+}
+.section-title {
+    background-color: #2563eb;
+    color: white;
+    padding: 10px 15px;
+    border-radius: 5px;
+    margin-bottom: 15px;
+    font-weight: bold;
+}
+.item-row {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    padding: 10px 0;
+    border-bottom: 1px solid #e2e8f0;
+}
+.item-row:last-child {
+    border-bottom: none;
+}
+.item-description {
+    flex: 1;
+}
+.item-details {
+    color: #64748b;
+    font-size: 0.9em;
+    margin-top: 5px;
+}
+.item-price {
+    text-align: right;
+    font-weight: bold;
+    min-width: 120px;
+}
+.totals {
+    background-color: #f1f5f9;
+    padding: 20px;
+    border-radius: 8px;
+    margin-top: 30px;
+}
+.total-row {
+    display: flex;
+    justify-content: space-between;
+    padding: 8px 0;
+    border-bottom: 1px solid #cbd5e1;
+}
+.total-row:last-child {
+    border-bottom: none;
+    border-top: 2px solid #2563eb;
+    font-weight: bold;
+    font-size: 1.2em;
+    color: #2563eb;
+}
+.footer {
+    margin-top: 40px;
+    text-align: center;
+    color: #64748b;
+    font-size: 0.9em;
+}
+.no-items {
+    text-align: center;
+    color: #64748b;
+    font-style: italic;
+    padding: 20px;
+}
+"""
+
+
+@lru_cache(maxsize=1)
+def _font_config() -> "FontConfiguration":
+    """Create the process-wide font configuration once and reuse it."""
+    return FontConfiguration()
+
+
+@lru_cache(maxsize=1)
+def _quote_stylesheets() -> list:
+    """Parse the quote stylesheet once and reuse the CSS object."""
+    return [CSS(string=QUOTE_STYLESHEET, font_config=_font_config())]
+
+
 class PDFGenerator:
     """Generates PDFs for quotes with proper option handling."""
     
@@ -39,6 +153,9 @@ class PDFGenerator:
         """
         Generate PDF for a quote with selected options.
         
+        Renders in the calling thread; async endpoints should use
+        build_quote_html and render_pdf in the PDF process pool instead.
+        
         Args:
             quote: The quote object
             quote_items: All quote items
@@ -49,53 +166,77 @@ class PDFGenerator:
         Returns:
             PDF bytes if successful, None if WeasyPrint unavailable
         """
-        if not self.weasyprint_available:
-            print("WeasyPrint not available - cannot generate PDF")
+        html_content = self.build_quote_html(
+            quote, quote_items, selected_item_ids, company, profile
+        )
+        if html_content is None:
             return None
         
         try:
-            # Separate mandatory and optional items
-            mandatory_items = [item for item in quote_items if not item.is_optional]
-            optional_items = [item for item in quote_items if item.is_optional]
-            
-            # Filter optional items to only include selected ones
-            selected_optional_items = [
-                item for item in optional_items 
-                if str(item.id) in selected_item_ids
-            ]
-            
-            # Calculate totals based on selection
-            base_subtotal = sum(item.line_total for item in mandatory_items)
-            optional_subtotal = sum(item.line_total for item in selected_optional_items)
-            total_subtotal = base_subtotal + optional_subtotal
-            
-            # Apply VAT rate
-            vat_rate = float(profile.vat_rate) / 100.0 if profile else 0.25
-            vat_amount = total_subtotal * Decimal(str(vat_rate))
-            total_amount = total_subtotal + vat_amount
-            
-            # Generate HTML content
-            html_content = self._generate_html_content(
-                quote=quote,
-                company=company,
-                mandatory_items=mandatory_items,
-                selected_optional_items=selected_optional_items,
-                base_subtotal=base_subtotal,
-                optional_subtotal=optional_subtotal,
-                total_subtotal=total_subtotal,
-                vat_amount=vat_amount,
-                total_amount=total_amount,
-                vat_rate=vat_rate * 100
-            )
-            
-            # Generate PDF
-            pdf_bytes = self._html_to_pdf(html_content)
-            return pdf_bytes
-            
+            return self._html_to_pdf(html_content)
         except Exception as e:
-            print(f"Error generating PDF: {e}")
+            logger.error("Error generating PDF: %s", e)
             return None
     
+    def build_quote_html(
+        self, 
+        quote: Quote, 
+        quote_items: List[QuoteItem],
+        selected_item_ids: List[str],
+        company: Company,
+        profile: PriceProfile
+    ) -> Optional[str]:
+        """
+        Build the HTML document for a quote PDF with selected options.
+        
+        Args:
+            quote: The quote object
+            quote_items: All quote items
+            selected_item_ids: IDs of selected optional items
+            company: Company information
+            profile: Price profile for VAT calculation
+            
+        Returns:
+            HTML string, or None if WeasyPrint is unavailable
+        """
+        if not self.weasyprint_available:
+            logger.warning("WeasyPrint not available - cannot generate PDF")
+            return None
+        
+        # Separate mandatory and optional items
+        mandatory_items = [item for item in quote_items if not item.is_optional]
+        optional_items = [item for item in quote_items if item.is_optional]
+        
+        # Filter optional items to only include selected ones
+        selected_optional_items = [
+            item for item in optional_items 
+            if str(item.id) in selected_item_ids
+        ]
+        
+        # Calculate totals based on selection
+        base_subtotal = sum(item.line_total for item in mandatory_items)
+        optional_subtotal = sum(item.line_total for item in selected_optional_items)
+        total_subtotal = base_subtotal + optional_subtotal
+        
+        # Apply VAT rate
+        vat_rate = float(profile.vat_rate) / 100.0 if profile else 0.25
+        vat_amount = total_subtotal * Decimal(str(vat_rate))
+        total_amount = total_subtotal + vat_amount
+        
+        # Generate HTML content
+        return self._generate_html_content(
+            quote=quote,
+            company=company,
+            mandatory_items=mandatory_items,
+            selected_optional_items=selected_optional_items,
+            base_subtotal=base_subtotal,
+            optional_subtotal=optional_subtotal,
+            total_subtotal=total_subtotal,
+            vat_amount=vat_amount,
+            total_amount=total_amount,
+            vat_rate=vat_rate * 100
+        )
+    
     def _generate_html_content(
         self,
         quote: Quote,
@@ -128,95 +269,6 @@ class PDFGenerator:
             <meta charset="UTF-8">
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>Offert - {quote.customer_name}</title>
-            <style>
-                body {{
-                    font-family: 'Arial', sans-serif;
-                    margin: 0;
-                    padding: 20px;
-                    color: #333;
-                    line-height: 1.6;
-                }}
-                .header {{
-                    text-align: center;
-                    border-bottom: 3px solid #2563eb;
-                    padding-bottom: 20px;
-                    margin-bottom: 30px;
-                }}
-                .company-info {{
-                    margin-bottom: 20px;
-                }}
-                .quote-details {{
-                    background-color: #f8fafc;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin-bottom: 30px;
-                }}
-                .items-section {{
-                    margin-bottom: 30px;
-                }}
-                .section-title {{
-                    background-color: #2563eb;
-                    color: white;
-                    padding: 10px 15px;
-                    border-radius: 5px;
-                    margin-bottom: 15px;
-                    font-weight: bold;
-                }}
-                .item-row {{
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    padding: 10px 0;
-                    border-bottom: 1px solid #e2e8f0;
-                }}
-                .item-row:last-child {{
-                    border-bottom: none;
-                }}
-                .item-description {{
-                    flex: 1;
-                }}
-                .item-details {{
-                    color: #64748b;
-                    font-size: 0.9em;
-                    margin-top: 5px;
-                }}
-                .item-price {{
-                    text-align: right;
-                    font-weight: bold;
-                    min-width: 120px;
-                }}
-                .totals {{
-                    background-color: #f1f5f9;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin-top: 30px;
-                }}
-                .total-row {{
-                    display: flex;
-                    justify-content: space-between;
-                    padding: 8px 0;
-                    border-bottom: 1px solid #cbd5e1;
-                }}
-                .total-row:last-child {{
-                    border-bottom: none;
-                    border-top: 2px solid #2563eb;
-                    font-weight: bold;
-                    font-size: 1.2em;
-                    color: #2563eb;
-                }}
-                .footer {{
-                    margin-top: 40px;
-                    text-align: center;
-                    color: #64748b;
-                    font-size: 0.9em;
-                }}
-                .no-items {{
-                    text-align: center;
-                    color: #64748b;
-                    font-style: italic;
-                    padding: 20px;
-                }}
-            </style>
         </head>
         <body>
             <div class="header">
@@ -308,25 +360,77 @@ class PDFGenerator:
     def _html_to_pdf(self, html_content: str) -> bytes:
         """Convert HTML to PDF using WeasyPrint."""
         try:
-            # Create temporary file for CSS
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.css', delete=False) as css_file:
-                css_file.write("")
-                css_file_path = css_file.name
-            
-            try:
-                # Generate PDF
-                html = HTML(string=html_content)
-                css = CSS(filename=css_file_path)
-                pdf_bytes = html.write_pdf(stylesheets=[css])
-                return pdf_bytes
-            finally:
-                # Clean up temporary file
-                os.unlink(css_file_path)
-                
+            return render_pdf(html_content)
         except Exception as e:
-            print(f"Error converting HTML to PDF: {e}")
+            logger.error("Error converting HTML to PDF: %s", e)
             raise
 
 
+def render_pdf(html_content: str) -> bytes:
+    """
+    Render an HTML document to PDF bytes.
+
+    Module-level so it can be submitted to the PDF process pool.
+    """
+    html = HTML(string=html_content)
+    return html.write_pdf(
+        stylesheets=_quote_stylesheets(), font_config=_font_config()
+    )
+
+
+def _warm_pdf_worker() -> None:
+    """
+    Pool initializer: load fonts and the stylesheet before the first job.
+
+    Fontconfig setup is the bulk of the first render in a fresh process,
+    so a tiny document is rendered here instead of on a customer's request.
+    """
+    if not WEASYPRINT_AVAILABLE:
+        return
+    try:
+        render_pdf("<p>warm-up</p>")
+    except Exception as e:
+        logger.warning("PDF worker warm-up failed: %s", e)
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool used for PDF rendering, creating it on first use.
+
+    WeasyPrint rendering is CPU-bound and can take seconds for large quotes,
+    so it runs in worker processes instead of the API event loop. Workers
+    are spawned (not forked) to avoid inheriting DB connections and threads,
+    and each one loads fonts and the stylesheet as it starts.
+    Pool size is PDF_WORKERS, defaulting to the CPU count.
+    """
+    global _pdf_pool
+    pool = _pdf_pool
+    if pool is not None:
+        return pool
+    # Sync endpoints run in the threadpool; the lock keeps two first
+    # requests from each spawning a pool and leaking the losing one
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv("PDF_WORKERS", os.cpu_count() or 1)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_pdf_worker,
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_pool() -> None:
+    """Shut down the PDF process pool if it was started."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 # Global instance
 pdf_generator = PDFGenerator()
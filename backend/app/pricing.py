@@ -1,13 +1,23 @@
 from decimal import Decimal
 
 
-def calc_totals(items, vat_rate: Decimal):
-    subtotal = sum((i["unit_price"] * i["qty"]) for i in items)
+def _totals(subtotal: Decimal, vat_rate: Decimal):
     vat = (subtotal * vat_rate / Decimal("100")).quantize(Decimal("0.01"))
     total = (subtotal + vat).quantize(Decimal("0.01"))
     return subtotal.quantize(Decimal("0.01")), vat, total
 
 
+def calc_totals(items, vat_rate: Decimal):
+    subtotal = sum((i["unit_price"] * i["qty"] for i in items), Decimal("0"))
+    return _totals(subtotal, vat_rate)
+
+
+def calc_item_totals(items, vat_rate: Decimal):
+    """Like calc_totals, for objects with unit_price and qty attributes."""
+    subtotal = sum((i.unit_price * i.qty for i in items), Decimal("0"))
+    return _totals(subtotal, vat_rate)
+
+
 def apply_material_markup(unit_cost: Decimal, markup_pct: Decimal) -> Decimal:
     return (unit_cost * (Decimal("1") + markup_pct / Decimal("100"))).quantize(
         Decimal("0.01")
@@ -11,25 +11,38 @@ How to run:
 4. Exceeds 10 req/min returns 429 Too Many Requests
 """
 
+import threading
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from typing import Deque, Optional, Set
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiting middleware."""
+class RateLimitMiddleware:
+    """
+    Simple in-memory rate limiting middleware.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so allowed requests are passed
+    straight to the app without an extra task and response stream.
+    """
+
+    __slots__ = ("app", "requests_per_minute", "request_counts", "window_size")
     
-    def __init__(self, app, requests_per_minute: int = 10):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, requests_per_minute: int = 10):
+        self.app = app
         self.requests_per_minute = requests_per_minute
         self.request_counts = defaultdict(list)
         self.window_size = 60  # 60 seconds
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request with rate limiting."""
-        client_ip = self._get_client_ip(request)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = self._get_client_ip(Request(scope))
         current_time = time.time()
         
         # Clean old requests outside the window
@@ -37,14 +50,15 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         # Check if client has exceeded rate limit
         if len(self.request_counts[client_ip]) >= self.requests_per_minute:
-            return self._create_rate_limit_response()
+            response = self._create_rate_limit_response()
+            await response(scope, receive, send)
+            return
         
         # Add current request to count
         self.request_counts[client_ip].append(current_time)
         
         # Process request
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
     
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP address, handling proxy headers."""
@@ -78,6 +92,57 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         )
 
 
+class BucketTimeRateLimit:
+    """
+    Once-per-window gate for keys, backed by a ring of time buckets.
+
+    The window is split into a fixed number of buckets. A key is recorded in
+    the current bucket and counts as seen until its bucket rotates out, so
+    memory holds only keys hit within the window and expiry is O(1) per
+    bucket instead of a scan or sort of every key. Per-process: each worker
+    keeps its own ring.
+    """
+
+    def __init__(self, window_seconds: float = 600, num_buckets: int = 10):
+        self.bucket_seconds = window_seconds / num_buckets
+        self._buckets: Deque[Set[str]] = deque(
+            (set() for _ in range(num_buckets)), maxlen=num_buckets
+        )
+        self._current_index = int(time.time() // self.bucket_seconds)
+        self._lock = threading.Lock()
+
+    def _rotate(self, now: float) -> None:
+        """Drop buckets that have fallen out of the window."""
+        index = int(now // self.bucket_seconds)
+        steps = min(index - self._current_index, self._buckets.maxlen)
+        for _ in range(steps):
+            self._buckets.append(set())
+        if index > self._current_index:
+            self._current_index = index
+
+    def hit(self, key: str, now: Optional[float] = None) -> bool:
+        """
+        Record a hit for key.
+
+        Returns:
+            True if key was not seen within the window (the caller should
+            act), False if it was
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._rotate(now)
+            if any(key in bucket for bucket in self._buckets):
+                return False
+            self._buckets[-1].add(key)
+            return True
+
+    def discard(self, key: str) -> None:
+        """Forget key, e.g. when the action it gated failed."""
+        with self._lock:
+            for bucket in self._buckets:
+                bucket.discard(key)
+
+
 def apply_rate_limits(app):
     """
     Apply rate limiting to the FastAPI application.
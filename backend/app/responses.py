@@ -0,0 +1,42 @@
+"""
+Fast JSON responses backed by orjson.
+
+orjson serializes UUIDs and datetimes natively and is considerably faster
+than the stdlib encoder used by FastAPI's default JSONResponse. Decimals are
+emitted as JSON numbers, matching what jsonable_encoder produced before.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _orjson_default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def orjson_dumps(content: Any) -> bytes:
+    """
+    Serialize content to JSON bytes with orjson.
+
+    Args:
+        content: JSON-compatible data (may contain Decimal, UUID, datetime)
+
+    Returns:
+        Encoded JSON bytes
+    """
+    return orjson.dumps(
+        content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of json.dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson_dumps(content)
@@ -6,8 +6,11 @@ Supports basic arithmetic, functions, and conditional logic.
 """
 
 import re
+import threading
+from collections import OrderedDict
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, List, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple, Union
 from enum import Enum
 
 
@@ -86,7 +89,8 @@ class RulesEvaluator:
         else:
             raise ValueError(f"Unsupported value type: {type(value)}")
 
-    def tokenize(self, expression: str) -> List[Token]:
+    @classmethod
+    def tokenize(cls, expression: str) -> List[Token]:
         """
         Tokenize the expression string.
 
@@ -134,7 +138,7 @@ class RulesEvaluator:
 
                 # Check if it's a function (followed by '(')
                 if i < len(expression) and expression[i] == '(':
-                    if identifier not in self.FUNCTIONS:
+                    if identifier not in cls.FUNCTIONS:
                         raise ValueError(f"Unknown function: {identifier}")
                     tokens.append(Token(TokenType.FUNCTION, identifier, start))
                 else:
@@ -160,7 +164,8 @@ class RulesEvaluator:
 
         return tokens
 
-    def _shunting_yard(self, tokens: List[Token]) -> List[Token]:
+    @classmethod
+    def _shunting_yard(cls, tokens: List[Token]) -> List[Token]:
         """
         Convert infix expression to RPN using Shunting Yard algorithm.
 
@@ -186,7 +191,7 @@ class RulesEvaluator:
             elif token.type == TokenType.OPERATOR:
                 while (operator_stack and
                        operator_stack[-1].type == TokenType.OPERATOR and
-                       self.OPERATORS[operator_stack[-1].value][0] >= self.OPERATORS[token.value][0]):
+                       cls.OPERATORS[operator_stack[-1].value][0] >= cls.OPERATORS[token.value][0]):
                     output.append(operator_stack.pop())
                 operator_stack.append(token)
 
@@ -219,91 +224,6 @@ class RulesEvaluator:
 
         return output
 
-    def _evaluate_rpn(self, rpn_tokens: List[Token]) -> Decimal:
-        """
-        Evaluate RPN expression.
-
-        Args:
-            rpn_tokens: List of tokens in RPN order
-
-        Returns:
-            Result as Decimal with 2 decimal places precision
-        """
-        stack = []
-
-        for token in rpn_tokens:
-            if token.type == TokenType.NUMBER:
-                stack.append(Decimal(token.value))
-
-            elif token.type == TokenType.VARIABLE:
-                if token.value not in self.variables:
-                    raise ValueError(f"Undefined variable: {token.value}")
-                value = self.variables[token.value]
-                if isinstance(value, str):
-                    raise ValueError(f"Variable {token.value} is a string and cannot be used in calculations")
-                stack.append(value)
-
-            elif token.type == TokenType.OPERATOR:
-                if len(stack) < 2:
-                    raise ValueError("Insufficient operands for operator")
-                b = stack.pop()
-                a = stack.pop()
-                result = self.OPERATORS[token.value][1](a, b)
-                stack.append(result)
-
-            elif token.type == TokenType.FUNCTION:
-                if token.value == 'ceil':
-                    if len(stack) < 1:
-                        raise ValueError("Insufficient operands for ceil function")
-                    x = stack.pop()
-                    result = self.FUNCTIONS['ceil'](x)
-                    stack.append(Decimal(str(result)))
-
-                elif token.value == 'floor':
-                    if len(stack) < 1:
-                        raise ValueError("Insufficient operands for floor function")
-                    x = stack.pop()
-                    result = self.FUNCTIONS['floor'](x)
-                    stack.append(Decimal(str(result)))
-
-                elif token.value == 'round':
-                    if len(stack) < 1:
-                        raise ValueError("Insufficient operands for round function")
-                    x = stack.pop()
-                    result = self.FUNCTIONS['round'](x)
-                    stack.append(result)
-
-                elif token.value == 'min':
-                    if len(stack) < 2:
-                        raise ValueError("Insufficient operands for min function")
-                    b = stack.pop()
-                    a = stack.pop()
-                    result = self.FUNCTIONS['min'](a, b)
-                    stack.append(result)
-
-                elif token.value == 'max':
-                    if len(stack) < 2:
-                        raise ValueError("Insufficient operands for max function")
-                    b = stack.pop()
-                    a = stack.pop()
-                    result = self.FUNCTIONS['max'](a, b)
-                    stack.append(result)
-
-                elif token.value == 'case':
-                    if len(stack) < 3:
-                        raise ValueError("Insufficient operands for case function")
-                    b = stack.pop()
-                    a = stack.pop()
-                    cond = stack.pop()
-                    result = self.FUNCTIONS['case'](cond, a, b)
-                    stack.append(result)
-
-        if len(stack) != 1:
-            raise ValueError("Invalid expression")
-
-        # Return result with 2 decimal places precision
-        return stack[0].quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
     def evaluate(self, expression: str) -> Decimal:
         """
         Evaluate a mathematical expression.
@@ -318,14 +238,163 @@ class RulesEvaluator:
             ValueError: If expression is invalid or contains unsupported operations
         """
         try:
-            tokens = self.tokenize(expression)
-            rpn_tokens = self._shunting_yard(tokens)
-            result = self._evaluate_rpn(rpn_tokens)
+            compiled = _compile_expression(expression)
+            result = compiled(self.variables)
             return result
         except Exception as e:
             raise ValueError(f"Expression evaluation failed: {str(e)}")
 
 
+# Number of stack operands consumed by each function
+_FUNCTION_ARITY = {'ceil': 1, 'floor': 1, 'round': 1, 'min': 2, 'max': 2, 'case': 3}
+
+# A compiled expression: takes the evaluator variables, returns the result
+CompiledExpression = Callable[[Dict[str, Any]], Decimal]
+
+
+def _compile_variable(name: str) -> CompiledExpression:
+    """Build a getter that resolves a variable at evaluation time."""
+    def get(variables: Dict[str, Any]) -> Decimal:
+        if name not in variables:
+            raise ValueError(f"Undefined variable: {name}")
+        value = variables[name]
+        if isinstance(value, str):
+            raise ValueError(f"Variable {name} is a string and cannot be used in calculations")
+        return value
+    return get
+
+
+def _compile_rpn(rpn_tokens: Tuple[Token, ...]) -> CompiledExpression:
+    """
+    Compile RPN tokens into a tree of closures.
+
+    The RPN stack is walked once at compile time, so evaluation is plain
+    nested function calls.
+
+    Args:
+        rpn_tokens: Tokens in RPN order
+
+    Returns:
+        Function taking the variables dict and returning the result with
+        2 decimal places precision
+
+    Raises:
+        ValueError: If operators or functions lack operands
+    """
+    stack: List[CompiledExpression] = []
+
+    for token in rpn_tokens:
+        if token.type == TokenType.NUMBER:
+            number = Decimal(token.value)
+            stack.append(lambda variables, number=number: number)
+
+        elif token.type == TokenType.VARIABLE:
+            stack.append(_compile_variable(token.value))
+
+        elif token.type == TokenType.OPERATOR:
+            if len(stack) < 2:
+                raise ValueError("Insufficient operands for operator")
+            b = stack.pop()
+            a = stack.pop()
+            op = RulesEvaluator.OPERATORS[token.value][1]
+            stack.append(lambda variables, a=a, b=b, op=op: op(a(variables), b(variables)))
+
+        elif token.type == TokenType.FUNCTION:
+            arity = _FUNCTION_ARITY[token.value]
+            if len(stack) < arity:
+                raise ValueError(f"Insufficient operands for {token.value} function")
+            args = tuple(stack[-arity:])
+            del stack[-arity:]
+            func = RulesEvaluator.FUNCTIONS[token.value]
+            if token.value in ('ceil', 'floor'):
+                # ceil/floor return ints; convert back to Decimal
+                stack.append(
+                    lambda variables, args=args, func=func:
+                        Decimal(str(func(*(arg(variables) for arg in args))))
+                )
+            else:
+                stack.append(
+                    lambda variables, args=args, func=func:
+                        func(*[arg(variables) for arg in args])
+                )
+
+    if len(stack) != 1:
+        raise ValueError("Invalid expression")
+
+    root = stack[0]
+    return lambda variables: root(variables).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+@lru_cache(maxsize=1024)
+def _compile_expression(expression: str) -> CompiledExpression:
+    """
+    Parse and compile an expression, cached per expression string.
+
+    Parsing only depends on the expression text (not on variable values), so
+    the same rule expressions evaluated across requests are compiled once
+    and later evaluations are a bare function call.
+
+    Args:
+        expression: Mathematical expression as string
+
+    Returns:
+        Compiled expression taking the variables dict
+
+    Raises:
+        ValueError: If expression cannot be parsed (failures are not cached)
+    """
+    tokens = RulesEvaluator.tokenize(expression)
+    return _compile_rpn(tuple(RulesEvaluator._shunting_yard(tokens)))
+
+
+# Flattened (ref, expression) pairs for the labor and material sections of a rule
+RuleItems = Tuple[Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...]]
+
+_RULE_ITEMS_CACHE_SIZE = 256
+_rule_items_cache: "OrderedDict[Tuple[Any, Any], RuleItems]" = OrderedDict()
+_rule_items_lock = threading.Lock()
+
+
+def get_rule_items(rule: Any) -> RuleItems:
+    """
+    Get the labor and material items of a generation rule as flat tuples.
+
+    Results are memoized per (rule.id, rule.updated_at), so an edited rule is
+    rebuilt automatically. Every expression is parsed up front, which also
+    warms the expression cache used by RulesEvaluator.evaluate.
+
+    Args:
+        rule: GenerationRule-like object with id, updated_at and rules
+
+    Returns:
+        Tuple of (labor_items, material_items), each a tuple of (ref, expression)
+    """
+    key = (rule.id, rule.updated_at)
+    with _rule_items_lock:
+        cached = _rule_items_cache.get(key)
+        if cached is not None:
+            _rule_items_cache.move_to_end(key)
+            return cached
+
+    rules = rule.rules or {}
+    items = (
+        tuple((rules.get("labor") or {}).items()),
+        tuple((rules.get("materials") or {}).items()),
+    )
+    for _, expression in items[0] + items[1]:
+        try:
+            _compile_expression(expression)
+        except (ValueError, TypeError, AttributeError):
+            pass  # Reported per item when the expression is evaluated
+
+    if rule.updated_at is not None:
+        with _rule_items_lock:
+            _rule_items_cache[key] = items
+            if len(_rule_items_cache) > _RULE_ITEMS_CACHE_SIZE:
+                _rule_items_cache.popitem(last=False)
+    return items
+
+
 def create_rules_evaluator(project_requirements: Dict) -> RulesEvaluator:
     """
     Factory function to create a RulesEvaluator from project requirements.
@@ -361,3 +430,39 @@ def create_rules_evaluator(project_requirements: Dict) -> RulesEvaluator:
             variables[key] = value
 
     return RulesEvaluator(variables)
+
+
+_EVALUATOR_CACHE_SIZE = 256
+_evaluator_cache: "OrderedDict[Tuple[Any, Any], RulesEvaluator]" = OrderedDict()
+_evaluator_lock = threading.Lock()
+
+
+def get_requirements_evaluator(requirements: Any) -> RulesEvaluator:
+    """
+    Get a RulesEvaluator for stored project requirements.
+
+    Evaluators hold no per-call state, so one is shared per
+    (requirements.id, requirements.updated_at) instead of converting the
+    requirement values on every auto-generation.
+
+    Args:
+        requirements: ProjectRequirements-like object with id, updated_at and data
+
+    Returns:
+        Configured RulesEvaluator instance
+    """
+    key = (requirements.id, requirements.updated_at)
+    with _evaluator_lock:
+        cached = _evaluator_cache.get(key)
+        if cached is not None:
+            _evaluator_cache.move_to_end(key)
+            return cached
+
+    evaluator = create_rules_evaluator(requirements.data)
+
+    if requirements.updated_at is not None:
+        with _evaluator_lock:
+            _evaluator_cache[key] = evaluator
+            if len(_evaluator_cache) > _EVALUATOR_CACHE_SIZE:
+                _evaluator_cache.popitem(last=False)
+    return evaluator
@@ -179,13 +179,15 @@ class QuoteAdjustmentLogOut(BaseModel):
     Shows what quantities were changed from auto-generated values.
     """
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     quote_id: UUID
     item_ref: str
     old_qty: Decimal
     new_qty: Decimal
     reason: Optional[str] = None
-    created_at: str
+    created_at: Optional[datetime] = None
 
 
 class QuoteAdjustmentLogCreate(BaseModel):
@@ -359,16 +361,8 @@ class GenerationRuleOut(BaseModel):
     company_id: UUID
     key: str
     rules: Dict[str, Any]
-    created_at: str
-    updated_at: str
-
-    @field_validator("created_at", "updated_at", mode="before")
-    @classmethod
-    def convert_datetime(cls, v):
-        """Convert datetime to ISO format string."""
-        if isinstance(v, datetime):
-            return v.isoformat()
-        return v
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 
 class GenerationRuleCreate(BaseModel):
@@ -511,6 +505,18 @@ class Company(BaseModel):
     tenant_id: UUID
 
 
+class PriceProfileOut(BaseModel):
+    """Output schema for price profiles."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    name: str
+    company_id: UUID
+    currency: str
+    vat_rate: float
+
+
 class PriceProfileCreate(BaseModel):
     """Schema for creating new price profiles."""
 
@@ -0,0 +1,220 @@
+"""
+Background tasks run after the response has been sent.
+
+Each task opens its own database session, since the request-scoped session
+from get_db is closed by the time background tasks execute.
+"""
+
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from . import crud, schemas
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def record_quote_event(event_data: schemas.QuoteEventCreate) -> None:
+    """
+    Persist a quote event outside the request path.
+
+    Event logging is best-effort: failures are reported but never raised,
+    matching how the endpoints treated event errors inline.
+
+    Args:
+        event_data: Event to store
+    """
+    db = SessionLocal()
+    try:
+        crud.create_quote_event(db, event_data)
+    except Exception as e:
+        db.rollback()
+        logger.warning("Could not create %s event: %s", event_data.type, e)
+    finally:
+        db.close()
+
+
+class QuoteEventBuffer:
+    """
+    Collect quote events in memory and insert them in batches.
+
+    A daemon thread flushes the buffer every flush_interval seconds, and a
+    flush is triggered early once max_batch events are waiting, so a burst
+    of tracking-pixel hits costs one INSERT and one commit per batch rather
+    than per event. At most max_pending events are held; further events are
+    dropped until the next flush. Events still buffered at shutdown are
+    flushed by stop().
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        max_batch: int = 500,
+        max_pending: int = 10_000,
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._events: List[Tuple[schemas.QuoteEventCreate, Optional[Callable[[], None]]]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add(
+        self,
+        event_data: schemas.QuoteEventCreate,
+        on_drop: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """
+        Queue an event for the next flush.
+
+        Args:
+            event_data: Event to store
+            on_drop: Called if the event is never stored, either because the
+                buffer is full or because its batch failed to insert
+
+        Returns:
+            True if the event was queued, False if the buffer was full
+        """
+        with self._lock:
+            accepted = len(self._events) < self.max_pending
+            if accepted:
+                self._events.append((event_data, on_drop))
+            full = len(self._events) >= self.max_batch
+        if full:
+            self._wakeup.set()
+        if not accepted:
+            logger.warning("Quote event buffer full, dropping %s event", event_data.type)
+            _call_on_drop([on_drop])
+        return accepted
+
+    def flush(self) -> int:
+        """
+        Insert all buffered events.
+
+        Like record_quote_event this is best-effort: a failed batch is
+        logged and dropped, and the on_drop callback of each event in it
+        is called.
+
+        Returns:
+            Number of events inserted
+        """
+        with self._lock:
+            batch, self._events = self._events, []
+        if not batch:
+            return 0
+
+        db = SessionLocal()
+        try:
+            return crud.create_quote_events(db, [event for event, _ in batch])
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not store %d quote events: %s", len(batch), e)
+            _call_on_drop(on_drop for _, on_drop in batch)
+            return 0
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """Start the background flush thread."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="quote-event-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write any remaining events."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def _call_on_drop(callbacks: Iterable[Optional[Callable[[], None]]]) -> None:
+    """Run the on_drop callbacks of dropped events, logging any failure."""
+    for callback in callbacks:
+        if callback is None:
+            continue
+        try:
+            callback()
+        except Exception as e:
+            logger.warning("Quote event on_drop callback failed: %s", e)
+
+
+quote_event_buffer = QuoteEventBuffer()
+
+
+def send_quote_email(
+    quote_id: UUID,
+    to_email: str,
+    message: Optional[str],
+    username: str,
+    public_url: str,
+    tracking_pixel_url: str,
+    customer_name: str,
+    project_name: Optional[str],
+    sent_at: str,
+) -> None:
+    """
+    Send a quote email and record the "sent" event.
+
+    Runs after /quotes/{id}/send has committed the status change, so the
+    request's database connection is already back in the pool.
+
+    Args:
+        quote_id: Quote being sent
+        to_email: Recipient address
+        message: Optional custom message
+        username: User who sent the quote
+        public_url: Public URL of the quote
+        tracking_pixel_url: Open-tracking pixel URL embedded in the email
+        customer_name: Customer name shown in the email
+        project_name: Project name shown in the email
+        sent_at: ISO timestamp of the status change
+    """
+    # Send email via stub (placeholder for SendGrid integration)
+    lines = [
+        "📧 SENDING QUOTE EMAIL:",
+        f"   To: {to_email}",
+        f"   Quote ID: {quote_id}",
+        f"   Public URL: {public_url}",
+        f"   Customer: {customer_name}",
+        f"   Project: {project_name}",
+    ]
+    if message:
+        lines.append(f"   Custom Message: {message}")
+    lines += [
+        "   Status: SENT",
+        f"   Tracking Pixel: {tracking_pixel_url}",
+        f'   Email HTML would include: <img src="{tracking_pixel_url}" width="1" height="1" />',
+    ]
+    logger.info("\n".join(lines))
+
+    record_quote_event(
+        schemas.QuoteEventCreate(
+            quote_id=quote_id,
+            type="sent",
+            meta={
+                "to": to_email,
+                "url": public_url,
+                "message": message,
+                "sent_by": username,
+                "sent_at": sent_at,
+            },
+        )
+    )
@@ -10,7 +10,7 @@ from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from . import crud, schemas
+from . import crud
 from .models import QuoteAdjustmentLog, TuningStat, GenerationRule
 
 
@@ -72,19 +72,44 @@ class TuningHelper:
         # Log the adjustment
         adjustment_log = crud.create_quote_adjustment_log(
             self.db,
-            schemas.QuoteAdjustmentLogCreate(
-                quote_id=quote_id,
-                item_ref=item_ref,
-                old_qty=old_qty,
-                new_qty=new_qty,
-                reason=adjustment_reason
-            )
+            quote_id=quote_id,
+            company_id=self.company_id,
+            item_ref=item_ref,
+            old_qty=old_qty,
+            new_qty=new_qty,
+            reason=adjustment_reason,
         )
         
         if adjustment_log:
             # Update tuning statistics
             self._update_tuning_statistics(rule_key, item_ref, clamped_factor)
     
+    def update_tuning_for_adjustments(
+        self,
+        room_type: str,
+        finish_level: str,
+        adjustments: List[Dict],
+    ) -> None:
+        """
+        Update tuning statistics for adjustments that are already logged.
+        
+        Args:
+            room_type: Room type from project requirements
+            finish_level: Finish level from project requirements
+            adjustments: Dicts with item_ref, old_qty and new_qty
+        """
+        rule_key = f"{room_type}|{finish_level}"
+        for adjustment in adjustments:
+            old_qty = adjustment["old_qty"]
+            if old_qty == 0:
+                adjustment_factor = Decimal('1.0')
+            else:
+                adjustment_factor = adjustment["new_qty"] / old_qty
+            clamped_factor = max(Decimal('0.8'), min(Decimal('1.2'), adjustment_factor))
+            self._update_tuning_statistics(
+                rule_key, adjustment["item_ref"], clamped_factor
+            )
+    
     def _update_tuning_statistics(self, rule_key: str, item_ref: str, adjustment_factor: Decimal) -> None:
         """
         Update tuning statistics for a specific rule key and item reference.
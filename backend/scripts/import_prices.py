@@ -6,7 +6,7 @@ import os
 from decimal import Decimal
 
 from app.db import Base, SessionLocal, engine
-from app.models import LaborRate, Material
+from app.models import LaborRate, Material, uuid7
 
 Base.metadata.create_all(engine)
 
@@ -16,36 +16,57 @@ COMPANY_ID = os.getenv("COMPANY_ID", "00000000-0000-0000-0000-000000000001")
 PROFILE_ID = os.getenv("PROFILE_ID", "00000000-0000-0000-0000-000000000001")
 
 
+def copy_rows(db, model, columns, rows):
+    """Strömma rader till tabellen med COPY FROM STDIN i stället för en INSERT per rad."""
+    cursor = db.connection().connection.driver_connection.cursor()
+    statement = f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN"
+    with cursor.copy(statement) as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
 def imp_labor(db):
     with open(LABOR_CSV, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            db.add(
-                LaborRate(
-                    company_id=COMPANY_ID,
-                    profile_id=PROFILE_ID,
-                    code=row["code"],
-                    description=row.get("description"),
-                    unit=row.get("unit", "hour"),
-                    unit_price=Decimal(row["unit_price"]),
+        copy_rows(
+            db,
+            LaborRate,
+            ("id", "company_id", "profile_id", "code", "description", "unit", "unit_price"),
+            (
+                (
+                    uuid7(),
+                    COMPANY_ID,
+                    PROFILE_ID,
+                    row["code"],
+                    row.get("description"),
+                    row.get("unit", "hour"),
+                    Decimal(row["unit_price"]),
                 )
-            )
+                for row in csv.DictReader(f)
+            ),
+        )
     db.commit()
 
 
 def imp_materials(db):
     with open(MATERIALS_CSV, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            db.add(
-                Material(
-                    company_id=COMPANY_ID,
-                    profile_id=PROFILE_ID,
-                    sku=row.get("sku"),
-                    name=row["name"],
-                    unit=row.get("unit", "pcs"),
-                    unit_cost=Decimal(row["unit_cost"]),
-                    markup_pct=Decimal(row.get("markup_pct", "20")),
+        copy_rows(
+            db,
+            Material,
+            ("id", "company_id", "profile_id", "sku", "name", "unit", "unit_cost", "markup_pct"),
+            (
+                (
+                    uuid7(),
+                    COMPANY_ID,
+                    PROFILE_ID,
+                    row.get("sku"),
+                    row["name"],
+                    row.get("unit", "pcs"),
+                    Decimal(row["unit_cost"]),
+                    Decimal(row.get("markup_pct", "20")),
                 )
-            )
+                for row in csv.DictReader(f)
+            ),
+        )
     db.commit()
 
 
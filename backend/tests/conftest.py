@@ -0,0 +1,118 @@
+"""
+Shared fixtures for unit tests.
+
+Besides the cache helpers, sqlite_sessionmaker provides an in-memory SQLite
+database with the full schema, for tests that need real sessions and rows
+rather than a mocked query chain.
+"""
+
+import secrets
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import auth, crud, models
+from app.db import Base
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_for_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture(autouse=True)
+def clear_lookup_caches():
+    """Start and end every test with empty module-level lookup caches."""
+    caches = (
+        auth._token_cache,
+        auth._signed_token_cache,
+        crud._public_token_cache,
+        crud._generation_rule_cache,
+        crud._primary_company_cache,
+    )
+    for cache in caches:
+        cache.clear()
+    yield
+    for cache in caches:
+        cache.clear()
+
+
+@pytest.fixture
+def mock_db():
+    """Build a session stub whose query(...).filter(...).first() returns a row."""
+    def make(first):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = first
+        return db
+    return make
+
+
+@pytest.fixture
+def sqlite_sessionmaker():
+    """Session factory for an in-memory SQLite database with all tables."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _register_now(dbapi_connection, connection_record):
+        # Server defaults use PostgreSQL's now()
+        dbapi_connection.create_function(
+            "now", 0, lambda: datetime.utcnow().isoformat(sep=" ")
+        )
+
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def seeded_quote(sqlite_sessionmaker):
+    """Insert a tenant, user, company, price profile and quote; return their IDs."""
+    db = sqlite_sessionmaker()
+    try:
+        tenant = models.Tenant(name="Test Tenant")
+        db.add(tenant)
+        db.flush()
+        user = models.User(
+            tenant_id=tenant.id,
+            email="alice@example.com",
+            username="alice",
+            hashed_password="not-a-real-hash",
+        )
+        company = models.Company(tenant_id=tenant.id, name="Test AB")
+        db.add_all([user, company])
+        db.flush()
+        profile = models.PriceProfile(company_id=company.id, name="Standard")
+        db.add(profile)
+        db.flush()
+        quote = models.Quote(
+            tenant_id=tenant.id,
+            company_id=company.id,
+            user_id=user.id,
+            customer_name="Kund",
+            profile_id=profile.id,
+            public_token=secrets.token_hex(16),
+        )
+        db.add(quote)
+        db.commit()
+        return SimpleNamespace(
+            tenant_id=tenant.id,
+            user_id=user.id,
+            username=user.username,
+            company_id=company.id,
+            profile_id=profile.id,
+            quote_id=quote.id,
+            public_token=quote.public_token,
+        )
+    finally:
+        db.close()
@@ -0,0 +1,164 @@
+"""
+Tests for JWT validation caching in app.auth.
+"""
+
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException, Request
+
+from app import auth, models
+
+COMPANY_ID = "223e4567-e89b-12d3-a456-426614174000"
+
+
+def _token_for(seeded_quote, **claims):
+    return auth.create_access_token(
+        {"sub": seeded_quote.username, "tenant_id": str(seeded_quote.tenant_id), **claims}
+    )
+
+
+def _rename_user(sqlite_sessionmaker, user_id, username):
+    db = sqlite_sessionmaker()
+    try:
+        db.query(models.User).filter(models.User.id == user_id).update(
+            {"username": username}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_valid_token_is_cached(sqlite_sessionmaker, seeded_quote):
+    """A cached token keeps resolving after its user row no longer matches."""
+    token = _token_for(seeded_quote)
+    db = sqlite_sessionmaker()
+    try:
+        user, _ = auth._resolve_token(token, db)
+        assert user.id == seeded_quote.user_id
+
+        _rename_user(sqlite_sessionmaker, seeded_quote.user_id, "renamed")
+
+        # Served from the cache, so the database is not consulted
+        cached_user, _ = auth._resolve_token(token, db)
+        assert cached_user is user
+
+        # A token that is not cached yet does hit the database
+        with pytest.raises(HTTPException) as exc_info:
+            auth._resolve_token(_token_for(seeded_quote, company_id=COMPANY_ID), db)
+        assert exc_info.value.status_code == 401
+    finally:
+        db.close()
+
+
+def test_cached_user_is_readable_after_session_closes(
+    sqlite_sessionmaker, seeded_quote
+):
+    """The cached user stays usable once its session and later ones are gone."""
+    token = _token_for(seeded_quote)
+    db = sqlite_sessionmaker()
+    try:
+        user, _ = auth._resolve_token(token, db)
+        # The endpoint commits; this must not expire the shared user
+        db.commit()
+    finally:
+        db.close()
+
+    db = sqlite_sessionmaker()
+    try:
+        cached_user, _ = auth._resolve_token(token, db)
+        db.commit()
+    finally:
+        db.close()
+
+    assert cached_user is user
+    assert user.id == seeded_quote.user_id
+    assert user.username == seeded_quote.username
+    assert user.tenant_id == seeded_quote.tenant_id
+    assert user.is_active is True
+
+
+def test_invalid_token_not_cached(sqlite_sessionmaker):
+    db = sqlite_sessionmaker()
+    try:
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                auth._resolve_token("not-a-jwt", db)
+            assert exc_info.value.status_code == 401
+    finally:
+        db.close()
+
+    assert len(auth._token_cache) == 0
+
+
+def test_expired_token_is_rejected(sqlite_sessionmaker, seeded_quote):
+    token = auth.create_access_token(
+        {"sub": seeded_quote.username, "tenant_id": str(seeded_quote.tenant_id)},
+        expires_delta=timedelta(seconds=-1),
+    )
+    db = sqlite_sessionmaker()
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            auth._resolve_token(token, db)
+        assert exc_info.value.status_code == 401
+    finally:
+        db.close()
+
+
+def test_cached_entry_respects_token_expiry(sqlite_sessionmaker, seeded_quote):
+    """An entry whose token has expired is rejected instead of reused."""
+    token = auth.create_access_token(
+        {"sub": seeded_quote.username, "tenant_id": str(seeded_quote.tenant_id)},
+        expires_delta=timedelta(seconds=-1),
+    )
+    token_hash = auth.hashlib.sha256(token.encode()).hexdigest()[:32]
+    db = sqlite_sessionmaker()
+    try:
+        user = db.get(models.User, seeded_quote.user_id)
+        auth._token_cache[token_hash] = (user, None, 0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            auth._resolve_token(token, db)
+        assert exc_info.value.status_code == 401
+    finally:
+        db.close()
+
+    assert token_hash not in auth._token_cache
+
+
+def test_unknown_user_is_rejected(sqlite_sessionmaker, seeded_quote):
+    token = auth.create_access_token(
+        {"sub": "nobody", "tenant_id": str(seeded_quote.tenant_id)}
+    )
+    db = sqlite_sessionmaker()
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            auth._resolve_token(token, db)
+        assert exc_info.value.status_code == 401
+    finally:
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_exposes_company_id_claim(
+    sqlite_sessionmaker, seeded_quote
+):
+    token = _token_for(seeded_quote, company_id=COMPANY_ID)
+    db = sqlite_sessionmaker()
+    try:
+        for _ in range(2):
+            request = Request({"type": "http", "headers": []})
+            user = await auth.get_current_user(request, token=token, db=db)
+            assert user.username == seeded_quote.username
+            assert str(request.state.token_company_id) == COMPANY_ID
+    finally:
+        db.close()
+
+
+def test_identical_claims_reuse_signed_token():
+    claims = {"sub": "alice", "tenant_id": "123e4567-e89b-12d3-a456-426614174000"}
+
+    token = auth.create_access_token(claims)
+    assert auth.create_access_token(dict(claims)) == token
+    assert auth.create_access_token({**claims, "sub": "bob"}) != token
+    assert auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])["sub"] == "alice"
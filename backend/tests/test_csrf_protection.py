@@ -136,6 +136,11 @@ class TestCSRFProtection:
         token2 = csrf_protection.generate_token()
         assert csrf_protection.validate_token(token, token2) == False
 
+        # Invalid case: well-formed token that was not signed by the server
+        forged = "A" * 43
+        assert csrf_protection.is_valid_token(forged) == False
+        assert csrf_protection.validate_token(forged, forged) == False
+
     def test_options_request_allowed_without_csrf_token(self):
         """Test that OPTIONS requests are allowed without CSRF token."""
         # OPTIONS requests should work without CSRF token (CORS preflight)
@@ -182,3 +187,36 @@ class TestCSRFProtection:
         
         assert "X-XSS-Protection" in response.headers
         assert response.headers["X-XSS-Protection"] == "1; mode=block"
+
+    def test_existing_csrf_cookie_is_reused(self):
+        """Test that a client's well-formed CSRF cookie is echoed back."""
+        from fastapi import FastAPI
+        from app.middleware import SecurityHeadersMiddleware
+
+        headers_app = FastAPI()
+        headers_app.add_middleware(SecurityHeadersMiddleware)
+        headers_app.get("/ping")(lambda: {"ok": True})
+        client = TestClient(headers_app)
+
+        token = csrf_protection.generate_token()
+        client.cookies.set("csrf_token", token)
+        assert client.get("/ping").headers["X-CSRF-Token"] == token
+
+        for planted in ("not-a-token", "A" * 43):
+            client.cookies.set("csrf_token", planted)
+            assert client.get("/ping").headers["X-CSRF-Token"] != planted
+
+    def test_security_middleware_adds_headers_to_csrf_rejection(self):
+        """Test that the combined middleware sets headers on CSRF failures."""
+        from fastapi import FastAPI
+        from app.middleware import SecurityMiddleware
+
+        combined_app = FastAPI()
+        combined_app.add_middleware(SecurityMiddleware)
+        combined_app.post("/submit")(lambda: {"ok": True})
+        client = TestClient(combined_app)
+
+        response = client.post("/submit")
+        assert response.status_code == 403
+        assert response.headers["X-Frame-Options"] == "DENY"
+        assert "X-CSRF-Token" not in response.headers
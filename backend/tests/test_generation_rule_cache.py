@@ -0,0 +1,66 @@
+"""
+Tests for the generation rule lookup cache in app.crud.
+"""
+
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from app import crud
+
+
+def test_rule_lookup_is_cached(mock_db):
+    company_id = uuid4()
+    rule = MagicMock(company_id=company_id, key="bathroom|standard")
+    db = mock_db(rule)
+
+    assert crud.get_generation_rule_by_key(db, company_id, "bathroom|standard") is rule
+    db.query.return_value.filter.return_value.first.return_value = None
+    assert crud.get_generation_rule_by_key(db, company_id, "bathroom|standard") is rule
+    db.expunge.assert_called_once_with(rule)
+
+
+def test_missing_rule_not_cached(mock_db):
+    db = mock_db(None)
+    company_id = uuid4()
+    rule = MagicMock(company_id=company_id, key="kitchen|basic")
+
+    assert crud.get_generation_rule_by_key(db, company_id, "kitchen|basic") is None
+    db.query.return_value.filter.return_value.first.return_value = rule
+    assert crud.get_generation_rule_by_key(db, company_id, "kitchen|basic") is rule
+
+
+def test_update_invalidates_cached_rule(mock_db):
+    company_id = uuid4()
+    rule = MagicMock(company_id=company_id, key="bathroom|standard")
+    db = mock_db(rule)
+    crud.get_generation_rule_by_key(db, company_id, "bathroom|standard")
+
+    crud.update_generation_rule(db, uuid4(), MagicMock(rules={"labor": {}}))
+
+    assert (company_id, "bathroom|standard") not in crud._generation_rule_cache
+
+
+def test_cached_rule_is_readable_after_session_closes(sqlite_sessionmaker, seeded_quote):
+    """The detached rule keeps its loaded attributes across sessions."""
+    key = "bathroom|standard"
+    rules = {"labor": {"PLUMBER": "4"}}
+    db = sqlite_sessionmaker()
+    try:
+        crud.create_generation_rule(db, seeded_quote.company_id, key, rules)
+        rule = crud.get_generation_rule_by_key(db, seeded_quote.company_id, key)
+        # The caller commits; this must not expire the shared rule
+        db.commit()
+    finally:
+        db.close()
+
+    db = sqlite_sessionmaker()
+    try:
+        assert crud.get_generation_rule_by_key(db, seeded_quote.company_id, key) is rule
+        db.commit()
+    finally:
+        db.close()
+
+    assert rule.company_id == seeded_quote.company_id
+    assert rule.key == key
+    assert rule.rules == rules
+    assert rule.created_at is not None
@@ -0,0 +1,36 @@
+"""
+Tests for lazy creation of the PDF rendering process pool.
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from app import pdf_generator
+
+
+def test_concurrent_first_calls_create_one_pool():
+    created = []
+    start = threading.Barrier(8)
+
+    def make_pool(**kwargs):
+        pool = MagicMock()
+        created.append(pool)
+        return pool
+
+    def first_request(results):
+        start.wait()
+        results.append(pdf_generator.get_pdf_pool())
+
+    results = []
+    with patch.object(pdf_generator, "ProcessPoolExecutor", side_effect=make_pool), \
+            patch.object(pdf_generator, "_pdf_pool", None):
+        threads = [threading.Thread(target=first_request, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pdf_generator.shutdown_pdf_pool()
+
+    assert len(created) == 1
+    assert all(pool is created[0] for pool in results)
+    created[0].shutdown.assert_called_once()
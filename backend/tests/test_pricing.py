@@ -0,0 +1,41 @@
+"""
+Unit tests for quote total calculation.
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.pricing import calc_item_totals, calc_totals
+
+
+def test_calc_totals():
+    items = [
+        {"unit_price": Decimal("650.00"), "qty": Decimal("8")},
+        {"unit_price": Decimal("12.50"), "qty": Decimal("3")},
+    ]
+    subtotal, vat, total = calc_totals(items, Decimal("25"))
+    assert subtotal == Decimal("5237.50")
+    assert vat == Decimal("1309.38")
+    assert total == Decimal("6546.88")
+
+
+def test_calc_totals_accepts_generator():
+    items = ({"unit_price": Decimal("100"), "qty": Decimal(n)} for n in (1, 2))
+    assert calc_totals(items, Decimal("25")) == (
+        Decimal("300.00"), Decimal("75.00"), Decimal("375.00")
+    )
+
+
+def test_calc_totals_empty():
+    assert calc_totals([], Decimal("25")) == (
+        Decimal("0.00"), Decimal("0.00"), Decimal("0.00")
+    )
+
+
+def test_calc_item_totals_matches_calc_totals():
+    rows = [
+        {"unit_price": Decimal("650.00"), "qty": Decimal("8")},
+        {"unit_price": Decimal("12.50"), "qty": Decimal("3")},
+    ]
+    items = [SimpleNamespace(**row) for row in rows]
+    assert calc_item_totals(items, Decimal("25")) == calc_totals(rows, Decimal("25"))
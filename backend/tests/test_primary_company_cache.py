@@ -0,0 +1,39 @@
+"""
+Tests for the primary company ID cache in app.crud.
+"""
+
+from app import crud, models
+
+
+def test_company_id_is_cached_across_sessions(sqlite_sessionmaker, seeded_quote):
+    db = sqlite_sessionmaker()
+    try:
+        company_id = crud.get_primary_company_id(db, seeded_quote.tenant_id)
+    finally:
+        db.close()
+    assert company_id == seeded_quote.company_id
+
+    # Removing the row behind the cache's back does not change the answer
+    db = sqlite_sessionmaker()
+    try:
+        db.query(models.Company).filter(models.Company.id == company_id).delete()
+        db.commit()
+        assert crud.get_primary_company_id(db, seeded_quote.tenant_id) == company_id
+    finally:
+        db.close()
+
+
+def test_tenant_without_company_not_cached(sqlite_sessionmaker):
+    db = sqlite_sessionmaker()
+    try:
+        tenant = models.Tenant(name="Empty Tenant")
+        db.add(tenant)
+        db.commit()
+        assert crud.get_primary_company_id(db, tenant.id) is None
+
+        company = models.Company(tenant_id=tenant.id, name="Ny AB")
+        db.add(company)
+        db.commit()
+        assert crud.get_primary_company_id(db, tenant.id) == company.id
+    finally:
+        db.close()
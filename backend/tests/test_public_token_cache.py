@@ -0,0 +1,52 @@
+"""
+Tests for the public token lookup cache in app.crud.
+"""
+
+from uuid import uuid4
+
+from app import crud
+
+
+def test_quote_ref_is_cached_until_invalidated(mock_db):
+    row = (uuid4(), uuid4(), uuid4(), "SENT")
+    db = mock_db(row)
+
+    ref = crud.get_quote_ref_by_public_token(db, "abc123")
+    assert ref == crud.QuoteRef(*row)
+
+    # Later lookups are served from the cache, not the changed row
+    accepted = (*row[:3], "ACCEPTED")
+    db.query.return_value.filter.return_value.first.return_value = accepted
+    assert crud.get_quote_ref_by_public_token(db, "abc123") is ref
+
+    crud.invalidate_public_token("abc123")
+    assert crud.get_quote_ref_by_public_token(db, "abc123") == crud.QuoteRef(*accepted)
+
+
+def test_unknown_token_not_cached(mock_db):
+    db = mock_db(None)
+    assert crud.get_quote_ref_by_public_token(db, "missing") is None
+
+    row = (uuid4(), uuid4(), uuid4(), "SENT")
+    db.query.return_value.filter.return_value.first.return_value = row
+    assert crud.get_quote_ref_by_public_token(db, "missing") == crud.QuoteRef(*row)
+
+
+def test_cached_ref_is_readable_after_session_closes(sqlite_sessionmaker, seeded_quote):
+    db = sqlite_sessionmaker()
+    try:
+        ref = crud.get_quote_ref_by_public_token(db, seeded_quote.public_token)
+    finally:
+        db.close()
+
+    db = sqlite_sessionmaker()
+    try:
+        assert crud.get_quote_ref_by_public_token(db, seeded_quote.public_token) is ref
+        db.commit()
+    finally:
+        db.close()
+
+    assert ref.id == seeded_quote.quote_id
+    assert ref.tenant_id == seeded_quote.tenant_id
+    assert ref.company_id == seeded_quote.company_id
+    assert ref.status == "draft"
@@ -0,0 +1,90 @@
+"""
+Tests for batched quote event inserts in app.tasks.
+"""
+
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app import schemas, tasks
+
+
+def _event():
+    return schemas.QuoteEventCreate(quote_id=uuid4(), type="opened", meta={})
+
+
+def test_flush_inserts_buffered_events_in_one_batch():
+    buffer = tasks.QuoteEventBuffer()
+    events = [_event() for _ in range(3)]
+    for event in events:
+        buffer.add(event)
+
+    with patch.object(tasks, "SessionLocal") as session_local, patch.object(
+        tasks.crud, "create_quote_events", return_value=3
+    ) as create_events:
+        assert buffer.flush() == 3
+        assert buffer.flush() == 0
+
+    create_events.assert_called_once_with(session_local.return_value, events)
+
+
+def test_failed_flush_is_logged_and_dropped():
+    buffer = tasks.QuoteEventBuffer()
+    buffer.add(_event())
+    db = MagicMock()
+
+    with patch.object(tasks, "SessionLocal", return_value=db), patch.object(
+        tasks.crud, "create_quote_events", side_effect=RuntimeError("db down")
+    ):
+        assert buffer.flush() == 0
+
+    db.rollback.assert_called_once()
+    db.close.assert_called_once()
+    assert buffer.flush() == 0
+
+
+def test_full_buffer_drops_new_events():
+    buffer = tasks.QuoteEventBuffer(max_pending=1)
+    dropped = []
+
+    assert buffer.add(_event(), on_drop=lambda: dropped.append("first"))
+    assert not buffer.add(_event(), on_drop=lambda: dropped.append("second"))
+    assert dropped == ["second"]
+
+
+def test_failed_flush_calls_on_drop():
+    buffer = tasks.QuoteEventBuffer()
+    dropped = []
+    buffer.add(_event(), on_drop=lambda: dropped.append("opened"))
+
+    with patch.object(tasks, "SessionLocal"), patch.object(
+        tasks.crud, "create_quote_events", side_effect=RuntimeError("db down")
+    ):
+        assert buffer.flush() == 0
+
+    assert dropped == ["opened"]
+
+
+def test_create_quote_events_maps_rows_to_model_columns():
+    """Rows must compile against the quote_event table as mapped."""
+    known, missing = _event(), _event()
+    company_id = uuid4()
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [
+        (known.quote_id, company_id)
+    ]
+
+    assert tasks.crud.create_quote_events(db, [known, missing]) == 1
+
+    statement, rows = db.execute.call_args.args
+    assert rows == [
+        {
+            "quote_id": known.quote_id,
+            "company_id": company_id,
+            "event_type": "opened",
+            "meta": {},
+        }
+    ]
+    statement.compile(dialect=postgresql.dialect(), column_keys=list(rows[0]))
+    db.commit.assert_called_once()
@@ -0,0 +1,113 @@
+"""
+Tests for quote event persistence against a real (SQLite) session.
+"""
+
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app import crud, models, schemas, tasks
+
+
+def _stored_events(sqlite_sessionmaker):
+    db = sqlite_sessionmaker()
+    try:
+        return [
+            (event.quote_id, event.company_id, event.event_type, event.meta)
+            for event in db.query(models.QuoteEvent).all()
+        ]
+    finally:
+        db.close()
+
+
+def test_create_quote_event_maps_type_and_company(sqlite_sessionmaker, seeded_quote):
+    db = sqlite_sessionmaker()
+    try:
+        event = crud.create_quote_event(
+            db,
+            schemas.QuoteEventCreate(
+                quote_id=seeded_quote.quote_id, type="accepted", meta={"a": 1}
+            ),
+        )
+        assert event.id is not None
+    finally:
+        db.close()
+
+    assert _stored_events(sqlite_sessionmaker) == [
+        (seeded_quote.quote_id, seeded_quote.company_id, "accepted", {"a": 1})
+    ]
+
+
+def test_create_quote_event_in_caller_transaction(sqlite_sessionmaker, seeded_quote):
+    """With commit=False the event is only written when the caller commits."""
+    db = sqlite_sessionmaker()
+    try:
+        with db.begin_nested():
+            crud.create_quote_event(
+                db,
+                schemas.QuoteEventCreate(
+                    quote_id=seeded_quote.quote_id, type="declined", meta={}
+                ),
+                commit=False,
+                company_id=seeded_quote.company_id,
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    assert [row[2] for row in _stored_events(sqlite_sessionmaker)] == ["declined"]
+
+
+def test_create_quote_event_for_unknown_quote(sqlite_sessionmaker, seeded_quote):
+    db = sqlite_sessionmaker()
+    try:
+        with pytest.raises(ValueError):
+            crud.create_quote_event(
+                db, schemas.QuoteEventCreate(quote_id=uuid4(), type="opened")
+            )
+    finally:
+        db.close()
+
+
+def test_record_quote_event_persists_row(sqlite_sessionmaker, seeded_quote):
+    """The background task writes through the real CRUD layer."""
+    with patch.object(tasks, "SessionLocal", sqlite_sessionmaker):
+        tasks.record_quote_event(
+            schemas.QuoteEventCreate(
+                quote_id=seeded_quote.quote_id,
+                type="option_updated",
+                meta={"selected_item_count": 2},
+            )
+        )
+
+    assert _stored_events(sqlite_sessionmaker) == [
+        (
+            seeded_quote.quote_id,
+            seeded_quote.company_id,
+            "option_updated",
+            {"selected_item_count": 2},
+        )
+    ]
+
+
+def test_send_quote_email_records_sent_event(sqlite_sessionmaker, seeded_quote):
+    with patch.object(tasks, "SessionLocal", sqlite_sessionmaker):
+        tasks.send_quote_email(
+            quote_id=seeded_quote.quote_id,
+            to_email="kund@example.com",
+            message=None,
+            username=seeded_quote.username,
+            public_url="https://example.com/public/quote/abc",
+            tracking_pixel_url="https://example.com/public/pixel/abc.png",
+            customer_name="Kund",
+            project_name=None,
+            sent_at="2025-01-01T00:00:00Z",
+        )
+
+    [(quote_id, company_id, event_type, meta)] = _stored_events(sqlite_sessionmaker)
+    assert (quote_id, company_id, event_type) == (
+        seeded_quote.quote_id, seeded_quote.company_id, "sent"
+    )
+    assert meta["to"] == "kund@example.com"
+    assert meta["sent_by"] == seeded_quote.username
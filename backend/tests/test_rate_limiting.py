@@ -16,6 +16,7 @@ import time
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from app.main import app
+from app.rate_limiting import BucketTimeRateLimit
 
 
 @pytest.fixture
@@ -126,5 +127,28 @@ class TestRateLimiting:
         assert "X-RateLimit-Reset" in response.headers
 
 
+class TestBucketTimeRateLimit:
+    """Test the once-per-window gate used for opened events."""
+
+    def test_second_hit_within_window_is_rejected(self):
+        limiter = BucketTimeRateLimit(window_seconds=600, num_buckets=10)
+        now = time.time()
+        assert limiter.hit("opened_abc", now=now) is True
+        assert limiter.hit("opened_abc", now=now + 300) is False
+        assert limiter.hit("opened_def", now=now + 300) is True
+
+    def test_hit_allowed_again_after_window(self):
+        limiter = BucketTimeRateLimit(window_seconds=600, num_buckets=10)
+        now = time.time()
+        assert limiter.hit("opened_abc", now=now) is True
+        assert limiter.hit("opened_abc", now=now + 660) is True
+
+    def test_discard_allows_retry(self):
+        limiter = BucketTimeRateLimit(window_seconds=600, num_buckets=10)
+        assert limiter.hit("opened_abc") is True
+        limiter.discard("opened_abc")
+        assert limiter.hit("opened_abc") is True
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -6,7 +6,7 @@ Tests various expressions, edge cases, and error conditions.
 
 import pytest
 from decimal import Decimal
-from app.rules_eval import RulesEvaluator, create_rules_evaluator, TokenType, Token
+from app.rules_eval import RulesEvaluator, create_rules_evaluator, get_requirements_evaluator, get_rule_items, TokenType, Token, _compile_expression
 
 
 class TestTokenType:
@@ -386,64 +386,28 @@ class TestShuntingYard:
 
 
 class TestRPNEvaluation:
-    """Test Reverse Polish Notation evaluation."""
-    
-    def setup_method(self):
-        """Set up test data for each test method."""
-        self.evaluator = RulesEvaluator({})
+    """Test evaluation of compiled RPN expressions."""
     
     def test_evaluate_rpn_simple(self):
         """Test simple RPN evaluation."""
-        tokens = [
-            Token(TokenType.NUMBER, "5", 0),
-            Token(TokenType.NUMBER, "3", 1),
-            Token(TokenType.OPERATOR, "+", 2)
-        ]
-        result = self.evaluator._evaluate_rpn(tokens)
-        assert result == Decimal("8.00")
+        assert _compile_expression("5 + 3")({}) == Decimal("8.00")
     
     def test_evaluate_rpn_multiplication(self):
         """Test RPN evaluation with multiplication."""
-        tokens = [
-            Token(TokenType.NUMBER, "4", 0),
-            Token(TokenType.NUMBER, "6", 1),
-            Token(TokenType.OPERATOR, "*", 2)
-        ]
-        result = self.evaluator._evaluate_rpn(tokens)
-        assert result == Decimal("24.00")
+        assert _compile_expression("4 * 6")({}) == Decimal("24.00")
     
     def test_evaluate_rpn_complex(self):
         """Test complex RPN evaluation."""
-        tokens = [
-            Token(TokenType.NUMBER, "2", 0),
-            Token(TokenType.NUMBER, "3", 1),
-            Token(TokenType.OPERATOR, "*", 2),
-            Token(TokenType.NUMBER, "1", 3),
-            Token(TokenType.OPERATOR, "+", 4)
-        ]
-        result = self.evaluator._evaluate_rpn(tokens)
         # 2 3 * 1 + = (2*3) + 1 = 6 + 1 = 7
-        assert result == Decimal("7.00")
+        assert _compile_expression("2 * 3 + 1")({}) == Decimal("7.00")
     
     def test_evaluate_rpn_division(self):
         """Test RPN evaluation with division."""
-        tokens = [
-            Token(TokenType.NUMBER, "10", 0),
-            Token(TokenType.NUMBER, "2", 1),
-            Token(TokenType.OPERATOR, "/", 2)
-        ]
-        result = self.evaluator._evaluate_rpn(tokens)
-        assert result == Decimal("5.00")
+        assert _compile_expression("10 / 2")({}) == Decimal("5.00")
     
     def test_evaluate_rpn_subtraction(self):
         """Test RPN evaluation with subtraction."""
-        tokens = [
-            Token(TokenType.NUMBER, "8", 0),
-            Token(TokenType.NUMBER, "3", 1),
-            Token(TokenType.OPERATOR, "-", 2)
-        ]
-        result = self.evaluator._evaluate_rpn(tokens)
-        assert result == Decimal("5.00")
+        assert _compile_expression("8 - 3")({}) == Decimal("5.00")
 
 
 class TestEdgeCases:
@@ -490,3 +454,76 @@ class TestEdgeCases:
         
         result = self.evaluator.evaluate("0/5")
         assert result == Decimal("0.00")
+
+
+class TestExpressionCache:
+    """Test that parsed expressions are shared across evaluators."""
+
+    def test_same_expression_parsed_once(self):
+        """Evaluators with different variables reuse the cached RPN."""
+        _compile_expression.cache_clear()
+
+        first = RulesEvaluator({"areaM2": 10}).evaluate("areaM2*2+1")
+        second = RulesEvaluator({"areaM2": 20}).evaluate("areaM2*2+1")
+
+        assert first == Decimal("21.00")
+        assert second == Decimal("41.00")
+        info = _compile_expression.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+
+    def test_invalid_expression_not_cached(self):
+        """Parse errors are raised every time and never cached."""
+        _compile_expression.cache_clear()
+        evaluator = RulesEvaluator({})
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                evaluator.evaluate("(8+2")
+
+        assert _compile_expression.cache_info().currsize == 0
+
+
+class TestRuleItemsCache:
+    """Test flattened rule items memoized per rule version."""
+
+    def _rule(self, updated_at, rules):
+        from types import SimpleNamespace
+        return SimpleNamespace(id="rule-1", updated_at=updated_at, rules=rules)
+
+    def test_items_cached_until_rule_updated(self):
+        rules = {"labor": {"PLUMB": "areaM2*2"}, "materials": {"TILE": "areaM2"}}
+        labor, materials = get_rule_items(self._rule(1, rules))
+        assert labor == (("PLUMB", "areaM2*2"),)
+        assert materials == (("TILE", "areaM2"),)
+
+        # Same version returns the cached tuples even if the dict changed
+        rules["labor"]["ELEC"] = "8"
+        assert get_rule_items(self._rule(1, rules))[0] == (("PLUMB", "areaM2*2"),)
+
+        # A new updated_at rebuilds the items
+        labor, _ = get_rule_items(self._rule(2, rules))
+        assert labor == (("PLUMB", "areaM2*2"), ("ELEC", "8"))
+
+    def test_missing_sections(self):
+        assert get_rule_items(self._rule(None, {})) == ((), ())
+
+
+class TestRequirementsEvaluatorCache:
+    """Test evaluators shared per requirements version."""
+
+    def _requirements(self, updated_at, area):
+        from types import SimpleNamespace
+        return SimpleNamespace(id="req-1", updated_at=updated_at, data={"area_m2": area})
+
+    def test_evaluator_reused_until_requirements_updated(self):
+        evaluator = get_requirements_evaluator(self._requirements(1, 10))
+        assert get_requirements_evaluator(self._requirements(1, 10)) is evaluator
+
+        updated = get_requirements_evaluator(self._requirements(2, 20))
+        assert updated is not evaluator
+        assert updated.evaluate("areaM2") == Decimal("20")
+
+    def test_unversioned_requirements_not_cached(self):
+        first = get_requirements_evaluator(self._requirements(None, 10))
+        assert get_requirements_evaluator(self._requirements(None, 10)) is not first